@@ -1,44 +1,169 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import uuid
 import uvicorn
 import os
-from uvr import download_mp3, separate_audio_tracks
+from uvr import close_http_client, download_mp3, separate_audio_tracks
 from aicover.aicover import AICoverProcessor
 
 
+# 추론을 돌릴 전용 스레드 수 (GPU 하나면 1)
+COVER_JOB_WORKERS = int(os.getenv("COVER_JOB_WORKERS", "1"))
+# 메모리에 남겨둘 작업 상태 수 (끝난 작업부터 지운다)
+COVER_JOB_HISTORY = int(os.getenv("COVER_JOB_HISTORY", "1000"))
+
 # FastAPI 인스턴스 생성
 app = FastAPI()
 
+cover_executor = ThreadPoolExecutor(
+    max_workers=COVER_JOB_WORKERS, thread_name_prefix="cover-job"
+)
+jobs = OrderedDict()  # job_id -> 상태 dict
+jobs_lock = threading.Lock()
+job_tasks = set()  # 진행 중인 run_cover_job task
+
+
 # # 데이터 모델 정의
 class requestBody(BaseModel):
     modelName : str
     guideAudioUrl : str
 
 
-# POST 요청 처리 - 새 아이템 생성
-@app.post("/", response_model=requestBody)
+class JobAccepted(BaseModel):
+    jobId: str
+    status: str
+
+
+class JobStatus(BaseModel):
+    jobId: str
+    status: str  # queued | running | done | failed
+    stage: Optional[str] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    request: requestBody
+    createdAt: float
+    updatedAt: float
+
+
+def update_job(job_id, **fields):
+    with jobs_lock:
+        job = jobs[job_id]
+        job.update(fields, updatedAt=time.time())
+
+
+def _trim_jobs():
+    # 오래된 것부터, 끝난 작업만 지운다.
+    for job_id in list(jobs):
+        if len(jobs) <= COVER_JOB_HISTORY:
+            break
+        if jobs[job_id]["status"] in ("done", "failed"):
+            del jobs[job_id]
+
+
+def _remove_intermediates(temp_dir):
+    # 분리 단계의 WAV 중간 결과는 mp3로 인코딩한 뒤라 더 쓰지 않는다.
+    for file_name in os.listdir(temp_dir):
+        if file_name.endswith(".wav"):
+            os.remove(os.path.join(temp_dir, file_name))
+
+
+def run_inference(job_id, gvocal_path, mr_path, model_name, identifier):
+    """전용 executor에서 실행되는 추론 (GPU 작업). 실제로 시작될 때 상태를 running으로 바꾼다."""
+    update_job(job_id, status="running", stage="inference", progress=0.5)
+    aicover_processor = AICoverProcessor(os.getenv("AWS_ACCESS_KEY"), os.getenv("AWS_SECRET_KEY"))
+    return aicover_processor.process_cover(gvocal_path, mr_path, model_name, identifier)
+
+
+async def run_cover_job(job_id, request_body):
+    """
+    요청 하나를 다운로드 -> 음원 분리 -> 추론 -> 후처리 순서로 처리하며 단계마다 상태를 갱신한다.
+    다운로드는 이벤트 루프에서, 분리와 추론은 각각 스레드에서 돌린다.
+    추론은 cover_executor 자리를 기다리는 동안 queued로 남는다.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        # 1. 음원 다운로드
+        update_job(job_id, status="running", stage="download", progress=0.05)
+        local_file_path, identifier = await download_mp3(request_body["guideAudioUrl"])
+
+        # 2. 음원 분리
+        update_job(job_id, stage="separation", progress=0.2)
+        result = await separate_audio_tracks(local_file_path, identifier)
+
+        # 3. 추론 (executor 자리가 날 때까지는 queued, 시작은 run_inference가 알린다)
+        update_job(job_id, status="queued", stage="inference")
+        await loop.run_in_executor(
+            cover_executor,
+            run_inference,
+            job_id,
+            result["vocal"],
+            result["mr"],
+            request_body["modelName"],
+            identifier,
+        )
+
+        # 4. 후처리
+        update_job(job_id, stage="postprocess", progress=0.9)
+        await loop.run_in_executor(
+            None, _remove_intermediates, os.path.dirname(local_file_path)
+        )
+
+        update_job(job_id, status="done", stage=None, progress=1.0)
+    except Exception as e:
+        update_job(job_id, status="failed", error=str(e))
+
+
+# POST 요청 처리 - 작업을 큐에 넣고 바로 job id를 반환
+@app.post("/", response_model=JobAccepted, status_code=202)
 async def receive_request(item: requestBody):
     request_body = item.model_dump()
-    # print(request_body)
-
-    # # 1. 음원 다운로드 - await로 완료될 때까지 대기하고 로컬 파일 경로 받기
-    # print("음원 다운로드 시작")
-    # local_file_path = await download_mp3(request_body["guideAudioUrl"])
-    
-    # # 2. 음원 분리 - 다운로드된 로컬 파일 경로를 전달
-    # print("음원 분리 시작")
-    # result = await separate_audio_tracks(local_file_path)
-
-    # 3. 추론
-    gvocal_path = "temp/u1FYiuqP/u1FYiuqP_gvocal.mp3"
-    mr_path = "temp/u1FYiuqP/u1FYiuqP_mr.mp3"
-    aicover_processor = AICoverProcessor(os.getenv("AWS_ACCESS_KEY"), os.getenv("AWS_SECRET_KEY"))
-    aicover_processor.process_cover(gvocal_path, mr_path, "ljb", "u1FYiuqP")
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with jobs_lock:
+        jobs[job_id] = {
+            "jobId": job_id,
+            "status": "queued",
+            "stage": None,
+            "progress": 0.0,
+            "error": None,
+            "request": request_body,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        _trim_jobs()
+
+    # 응답은 바로 보내고 작업은 백그라운드 task로 이어간다. (task 참조는 끝날 때까지 보관)
+    task = asyncio.create_task(run_cover_job(job_id, request_body))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+
+    return {"jobId": job_id, "status": "queued"}
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # 대기 중인 작업은 취소하고, 다운로드용 공용 커넥션 풀과 추론 executor를 정리
+    for task in list(job_tasks):
+        task.cancel()
+    await close_http_client()
+    cover_executor.shutdown(wait=False, cancel_futures=True)
 
-    return item
 
+# GET 요청 처리 - 작업 상태/진행률 조회
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return dict(job)
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,142 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 워커가 살아 있는 동안 Drive에서 받은 파일을 보관할 위치와 최대 크기
+DRIVE_CACHE_DIR = os.getenv("DRIVE_CACHE_DIR", "/app/drive_cache")
+DRIVE_CACHE_MAX_GB = float(os.getenv("DRIVE_CACHE_MAX_GB", "20"))
+# 0이면 캐시 없이 매번 받는다.
+DRIVE_CACHE_ENABLED = os.getenv("DRIVE_CACHE_ENABLED", "1") == "1"
+
+
+def cache_key(file_metadata):
+    """
+    Drive 파일 ID + 내용 버전(md5Checksum, 없으면 modifiedTime)으로 key를 만듭니다.
+    파일이 Drive에서 바뀌면 key가 달라지므로 목록 조회(메타데이터)만으로 신선도를 판단한다.
+    """
+    version = file_metadata.get("md5Checksum") or file_metadata.get("modifiedTime")
+    if not version:
+        return None
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", f"{file_metadata['id']}-{version}")
+
+
+class DriveCache:
+    """
+    Drive 파일을 내용 기준 key로 보관하는 디스크 캐시.
+
+    캐시에 있으면 다운로드 없이 목적지에 hardlink(다른 파일시스템이면 복사)하고,
+    총 크기가 max_bytes를 넘으면 가장 오래 안 쓴 파일부터 지운다.
+    hardlink된 파일은 캐시에서 지워져도 목적지 쪽은 그대로 남는다.
+    """
+
+    def __init__(self, cache_dir=DRIVE_CACHE_DIR, max_bytes=int(DRIVE_CACHE_MAX_GB * 1024**3)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pins = {}  # 목적지에 놓는 중인 blob 경로 -> 사용 수 (evict 대상에서 제외)
+        self.hits = 0
+        self.misses = 0
+
+    def blob_path(self, key):
+        return os.path.join(self.cache_dir, "blobs", key)
+
+    def fetch(self, file_metadata, dest_path, download_fn):
+        """
+        file_metadata 파일을 dest_path에 놓습니다.
+        캐시에 없을 때만 download_fn(file_metadata, path)로 받아 캐시에 넣습니다.
+        """
+        key = cache_key(file_metadata)
+        if key is None:
+            return download_fn(file_metadata, dest_path)
+
+        blob = self.blob_path(key)
+        # hit 확인부터 목적지에 놓을 때까지 blob을 pin해서 evict가 지우지 못하게 한다.
+        with self._lock:
+            hit = os.path.exists(blob)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._pins[blob] = self._pins.get(blob, 0) + 1
+        try:
+            if hit:
+                # LRU 순서는 atime으로 갱신한다. mtime을 바꾸면 hardlink된 모델 파일의
+                # mtime도 바뀌어 model_registry/feature_index 캐시가 매번 무효화된다.
+                st = os.stat(blob)
+                os.utime(blob, ns=(time.time_ns(), st.st_mtime_ns))
+                logger.info(f"Drive cache hit: {file_metadata['name']} ({key})")
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                tmp_blob = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    download_fn(file_metadata, tmp_blob)
+                    os.replace(tmp_blob, blob)
+                finally:
+                    if os.path.exists(tmp_blob):
+                        os.remove(tmp_blob)
+                self.evict()
+
+            self._place(blob, dest_path)
+        finally:
+            with self._lock:
+                self._pins[blob] -= 1
+                if not self._pins[blob]:
+                    del self._pins[blob]
+        return dest_path
+
+    @staticmethod
+    def _place(blob, dest_path):
+        # 임시 이름에 link/복사한 뒤 os.replace로 바꿔 끼우므로, 읽는 쪽은 이전 파일이나
+        # 완성된 새 파일만 보고 빈 자리나 복사 중인 파일을 보지 않는다.
+        tmp_path = f"{dest_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            try:
+                os.link(blob, tmp_path)
+            except OSError:
+                shutil.copy2(blob, tmp_path)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """
+        총 크기가 max_bytes 이하가 될 때까지 오래 안 쓴(atime) 파일부터 지웁니다.
+        fetch 중인(pin된) blob은 지우지 않는다.
+        """
+        blob_dir = os.path.join(self.cache_dir, "blobs")
+        with self._lock:
+            entries = []
+            for name in os.listdir(blob_dir):
+                path = os.path.join(blob_dir, name)
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted from Drive cache: {path} ({size / 1024**2:.1f}MB)")
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+drive_cache = DriveCache() if DRIVE_CACHE_ENABLED else None
@@ -5,11 +5,33 @@ import subprocess
 import os
 import logging
 import shutil
+import signal
 import sys
+import threading
 from typing import Dict, Any
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from infer import infer_ai_cover
+from infer import (
+    GUIDES_DIR,
+    convert_segment,
+    cover_job_locks,
+    finish_cover_job,
+    infer_ai_cover,
+    postprocess_segment,
+    prepare_cover_job,
+)
+from instrumentation import Trace, collector
+from main import warmup_models
+from rmvpe import rmvpe_load_count
+from s3_upload import BackgroundUploader, S3Uploader, make_s3_client, s3_key
+from scheduler import (
+    SCHEDULER_DOWNLOAD_WORKERS,
+    SCHEDULER_INFERENCE_WORKERS,
+    SCHEDULER_POSTPROCESS_WORKERS,
+    SCHEDULER_UPLOAD_WORKERS,
+    Stage,
+    StagedScheduler,
+)
 import requests
 import os
 from dotenv import load_dotenv
@@ -31,25 +53,76 @@ class InferenceError(Exception):
     pass
 
 
+# 워커 모드 설정 (SQS_ENDPOINT_URL은 localstack/elasticmq 같은 로컬 SQS용)
+SQS_ENDPOINT_URL = os.getenv("SQS_ENDPOINT_URL") or None
+SQS_WAIT_TIME_SECONDS = int(os.getenv("SQS_WAIT_TIME_SECONDS", "20"))
+SQS_VISIBILITY_TIMEOUT = int(os.getenv("SQS_VISIBILITY_TIMEOUT", "300"))
+SQS_HEARTBEAT_INTERVAL = int(os.getenv("SQS_HEARTBEAT_INTERVAL", "60"))
+
+# cleanup 때 지우지 않을 기본 모델 (Docker 이미지에 포함되어 다시 받을 수 없다)
+BASE_MODEL_FILES = ("hubert_base.pt", "rmvpe.pt")
+
+
+def make_sqs_client():
+    return boto3.client(
+        "sqs",
+        region_name="ap-northeast-2",
+        endpoint_url=SQS_ENDPOINT_URL,
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+
+
+def request_data_from_env():
+    """단일 실행 모드: 컨테이너 환경변수에서 신청곡 데이터를 읽습니다."""
+    return {
+        "requestId": os.environ["REQUEST_ID"],
+        "requestUserId": os.environ["REQUEST_USER_ID"],
+        "modelName": os.environ["MODEL_NAME"],
+        "isMaleSinger": os.environ["IS_MALE_SINGER"].lower() == "true",
+        "model": os.environ["MODEL"],
+        "guideName": os.environ["GUIDE_NAME"],
+        "guideId": os.environ["GUIDE_ID"],
+        "requestAt": os.environ["REQUEST_AT"],
+    }
+
+
+def request_data_from_message(body):
+    """워커 모드: SQS 메시지 본문(JSON, 환경변수와 같은 camelCase key)을 읽습니다."""
+    data = json.loads(body)
+    is_male = data["isMaleSinger"]
+    if isinstance(is_male, str):
+        is_male = is_male.lower() == "true"
+    return {
+        "requestId": str(data["requestId"]),
+        "requestUserId": str(data["requestUserId"]),
+        "modelName": data["modelName"],
+        "isMaleSinger": bool(is_male),
+        "model": data["model"],
+        "guideName": data["guideName"],
+        "guideId": data["guideId"],
+        "requestAt": data["requestAt"],
+    }
+
+
 class SQSProcessor:
-    def __init__(self):
-        self.s3 = boto3.client(
-            "s3",
-            region_name="ap-northeast-2",
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
-        self.sqs = boto3.client(
-            "sqs",
-            region_name="ap-northeast-2",
+    def __init__(self, request_data=None, receipt_handle=None, s3=None, sqs=None):
+        """
+        request_data/receipt_handle을 주지 않으면 기존처럼 환경변수에서 읽습니다.
+        워커 모드에서는 메시지마다 만들고 s3/sqs 클라이언트를 재사용합니다.
+        """
+        self.s3 = s3 or make_s3_client(
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
             aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
         )
+        self.sqs = sqs or make_sqs_client()
         self.bucket_name = "song-request-bucket-1"
         self.queue_url = os.getenv("SQS_QUEUE_URL")  # SQS 큐 URL 환경변수 추가
-        self.receipt_handle = os.getenv(
+        self.receipt_handle = receipt_handle or os.getenv(
             "SQS_RECEIPT_HANDLE"
         )  # 메시지 receipt handle 환경변수 추가
+        # 스케줄러 모드에서 다운로드~추론 동안 잡고 있는 공용 폴더 lock
+        self.held_locks = []
 
         self.pitch_values_by_model = {
             "ljb": [-1, 0, 1],
@@ -57,17 +130,11 @@ class SQSProcessor:
             "ssh": [0, 1],
         }
 
+        if request_data is not None:
+            self.request_data = request_data
+            return
         try:
-            self.request_data = {
-                "requestId": os.environ["REQUEST_ID"],
-                "requestUserId": os.environ["REQUEST_USER_ID"],
-                "modelName": os.environ["MODEL_NAME"],
-                "isMaleSinger": os.environ["IS_MALE_SINGER"].lower() == "true",
-                "model": os.environ["MODEL"],
-                "guideName": os.environ["GUIDE_NAME"],
-                "guideId": os.environ["GUIDE_ID"],
-                "requestAt": os.environ["REQUEST_AT"],
-            }
+            self.request_data = request_data_from_env()
         except KeyError as e:
             logger.error(f"Missing required environment variable: {e}")
             sys.exit(1)
@@ -89,28 +156,51 @@ class SQSProcessor:
             return False
 
     def upload_folder_to_s3(self, input_dir: str, save_s3_dir: str):
+        """결과 폴더의 최종 mr/reverb 파일만 병렬로 S3에 올립니다."""
         try:
-            for root, _, files in os.walk(input_dir):
-                logger.info(f"Scanning directory: {root}, Found files: {files}")
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    s3_path = os.path.join(
-                        save_s3_dir, os.path.relpath(file_path, input_dir)
-                    )
-
-                    try:
-                        self.s3.upload_file(file_path, self.bucket_name, s3_path)
-                        logger.info(f"Uploaded {file_path} to {s3_path}")
-                    except Exception as e:
-                        logger.error(f"Failed to upload {file_path}: {e}")
-                        raise
+            uploader = S3Uploader(self.s3, self.bucket_name)
+            uploaded = uploader.upload_folder(input_dir, save_s3_dir)
+            logger.info(f"Uploaded {len(uploaded)} files to {save_s3_dir}")
+            return uploaded
 
         except Exception as e:
             logger.error(f"Error in upload_folder_to_s3: {e}")
             raise
 
     def process_song_request(self) -> bool:
-        """신청곡 데이터를 처리하고 추론을 실행합니다."""
+        """
+        신청곡 데이터를 처리하고 추론을 실행합니다.
+        단계별 wall/CPU time과 RSS 보고서는 로그에 남기고 결과 파일 옆(S3)에 올립니다.
+        """
+        trace = self.make_trace()
+        try:
+            with collector.bind(trace):
+                return self._process_song_request()
+        finally:
+            self.finish_trace(trace)
+
+    def make_trace(self):
+        return Trace(
+            "process_song_request",
+            request_id=self.request_data["requestId"],
+            voice_model=self.request_data["model"],
+            guide_id=self.request_data["guideId"],
+        )
+
+    def finish_trace(self, trace):
+        """보고서를 ./temp/{request_id}/timing_report.json에 쓰고 결과 폴더와 같은 S3 경로에 올립니다."""
+        request_id = self.request_data["requestId"]
+        report_path = os.path.join("./temp", request_id, "timing_report.json")
+        if not collector.finish_trace(trace, report_path):
+            return
+        try:
+            S3Uploader(self.s3, self.bucket_name).upload_file(
+                report_path, s3_key(f"/song-requests/{request_id}", "timing_report.json")
+            )
+        except Exception as e:
+            logger.error(f"Failed to upload timing report: {e}")
+
+    def _process_song_request(self) -> bool:
         try:
             song_data = {
                 "request_id": self.request_data["requestId"],
@@ -122,47 +212,38 @@ class SQSProcessor:
                 "request_at": self.request_data["requestAt"],
             }
 
+            # 완성된 (mr, reverb) 쌍은 추론이 끝나기 전에 백그라운드에서 바로 올린다.
+            uploader = BackgroundUploader(
+                S3Uploader(self.s3, self.bucket_name),
+                f"./temp/{song_data['request_id']}",
+                f"/song-requests/{song_data['request_id']}",
+            )
             try:
-                result_folder_dir, song_uris = infer_ai_cover(
-                    song_data["request_id"],
-                    song_data["request_user_id"],
-                    song_data["song_title"],
-                    song_data["guide_id"],
-                    song_data["voice_model"],
-                    song_data["isMan"],
-                )
+                with collector.stage("infer_ai_cover"):
+                    result_folder_dir, song_uris = infer_ai_cover(
+                        song_data["request_id"],
+                        song_data["request_user_id"],
+                        song_data["song_title"],
+                        song_data["guide_id"],
+                        song_data["voice_model"],
+                        song_data["isMan"],
+                        on_pair_ready=uploader.submit,
+                    )
 
                 logger.info(
                     f"Inference successful. Output directory: {result_folder_dir}"
                 )
 
-                logger.info("Starting S3 upload")
-                self.upload_folder_to_s3(
-                    result_folder_dir, f"/song-requests/{song_data['request_id']}"
-                )
-                logger.info("S3 upload completed")
-
-                # api 요청
-                infer_complete_api_url = "https://asia-northeast3-homebrew-prod.cloudfunctions.net/processSongRequest"
-                songRequestId = song_data["request_id"]
-                infer_data_body = {
-                    "songRequestId": songRequestId,
-                    "audioPairList": song_uris,
-                }
-                logger.info(
-                    f"api 전송을 위한 데이터 request id : {songRequestId}, urlList : {song_uris}"
-                )
-                response = requests.post(infer_complete_api_url, json=infer_data_body)
-                logger.info(f"제조 완료 알림을 위한 api 전송 완료: {response.json()}")
+                logger.info("Waiting for remaining S3 uploads")
+                with collector.stage("s3_upload"):
+                    uploaded = uploader.wait()
+                logger.info(f"S3 upload completed: {len(uploaded)} files")
 
-                # 모든 작업이 성공적으로 완료된 후 SQS 메시지 삭제
-                if not self.delete_sqs_message():
-                    logger.error(
-                        "Failed to delete SQS message after successful processing"
-                    )
+                if not self.notify_completion(song_uris):
                     return False
 
             except Exception as e:
+                uploader.cancel()
                 logger.error(f"Error during inference or upload: {str(e)}")
                 return False
 
@@ -172,8 +253,97 @@ class SQSProcessor:
             logger.error(f"Error in process_song_request: {str(e)}")
             return False
 
+    def notify_completion(self, song_uris) -> bool:
+        """제조 완료 api를 호출하고 SQS 메시지를 삭제합니다."""
+        # api 요청
+        infer_complete_api_url = "https://asia-northeast3-homebrew-prod.cloudfunctions.net/processSongRequest"
+        songRequestId = self.request_data["requestId"]
+        infer_data_body = {
+            "songRequestId": songRequestId,
+            "audioPairList": song_uris,
+        }
+        logger.info(
+            f"api 전송을 위한 데이터 request id : {songRequestId}, urlList : {song_uris}"
+        )
+        with collector.stage("callback"):
+            response = requests.post(infer_complete_api_url, json=infer_data_body)
+        logger.info(f"제조 완료 알림을 위한 api 전송 완료: {response.json()}")
+
+        # 모든 작업이 성공적으로 완료된 후 SQS 메시지 삭제
+        with collector.stage("sqs_delete"):
+            deleted = self.delete_sqs_message()
+        if not deleted:
+            logger.error("Failed to delete SQS message after successful processing")
+            return False
+        return True
+
+    # 아래 stage_* 메서드는 StagedScheduler에서 단계별로 나눠 실행할 때 쓴다.
+    # (다운로드 -> GPU 추론 -> CPU 후처리 -> 업로드/완료 알림)
+    def stage_download(self):
+        request_id = self.request_data["requestId"]
+        self.uploader = BackgroundUploader(
+            S3Uploader(self.s3, self.bucket_name),
+            f"./temp/{request_id}",
+            f"/song-requests/{request_id}",
+        )
+        # 가이드/모델 폴더는 요청끼리 공유하므로 추론이 끝날 때까지 다른 요청이 덮어쓰지 못하게 잡는다.
+        with collector.stage("wait_shared_paths"):
+            for lock in cover_job_locks(
+                self.request_data["guideId"], self.request_data["model"]
+            ):
+                lock.acquire()
+                self.held_locks.append(lock)
+        with collector.stage("download"):
+            self.job = prepare_cover_job(
+                request_id,
+                self.request_data["guideName"],
+                self.request_data["guideId"],
+                self.request_data["model"],
+            )
+
+    def stage_inference(self):
+        try:
+            with collector.stage("inference"):
+                self.segments = [
+                    convert_segment(self.job, index, input_path)
+                    for index, input_path in enumerate(self.job["input_paths"])
+                ]
+        finally:
+            self.release_locks()
+
+    def release_locks(self):
+        # 다운로드 스레드에서 잡고 추론 스레드(또는 실패 처리)에서 푼다. threading.Lock이라 가능하다.
+        while self.held_locks:
+            self.held_locks.pop().release()
+
+    def stage_postprocess(self):
+        with collector.stage("postprocess"):
+            for segment in self.segments:
+                postprocess_segment(self.job, segment, self.uploader.submit)
+
+    def stage_upload(self):
+        with collector.stage("s3_upload"):
+            uploaded = self.uploader.wait()
+        logger.info(f"S3 upload completed: {len(uploaded)} files")
+        _, song_uris = finish_cover_job(self.job)
+        if not self.notify_completion(song_uris):
+            raise InferenceError("Failed to notify completion")
+
+    def cleanup_request(self, remove_guide=True):
+        """
+        스케줄러 모드용 정리. 다른 요청이 쓰는 중일 수 있는 공용 폴더는 건드리지 않고
+        이번 요청의 결과 폴더와 가이드 폴더만 지웁니다.
+        """
+        remove_path(os.path.join("./temp", self.request_data["requestId"]))
+        if remove_guide:
+            remove_path(os.path.join(GUIDES_DIR, self.request_data["guideId"]))
+
     def cleanup(self):
-        """리소스 정리"""
+        """
+        리소스 정리.
+        기본 모델(hubert_base.pt, rmvpe.pt)은 남기고, 이번 요청의 임시 폴더를 지웁니다.
+        (timing_report.json은 finish_trace에서 S3에 올린 뒤다)
+        """
         try:
             folders_to_clean = ["/app/guides", "/app/rvc_models", "/temp"]
 
@@ -182,19 +352,17 @@ class SQSProcessor:
                     logger.info(f"Cleaning {folder}")
                     try:
                         for filename in os.listdir(folder):
-                            file_path = os.path.join(folder, filename)
-                            try:
-                                if os.path.isfile(file_path) or os.path.islink(
-                                    file_path
-                                ):
-                                    os.unlink(file_path)
-                                elif os.path.isdir(file_path):
-                                    shutil.rmtree(file_path)
-                            except Exception as e:
-                                logger.error(f"Failed to delete {file_path}: {e}")
+                            if filename in BASE_MODEL_FILES:
+                                continue
+                            remove_path(os.path.join(folder, filename))
                     except Exception as e:
                         logger.error(f"Error while cleaning {folder}: {e}")
 
+            request_folder = os.path.join("./temp", self.request_data["requestId"])
+            if os.path.isdir(request_folder):
+                logger.info(f"Cleaning {request_folder}")
+                remove_path(request_folder)
+
             logger.info("Cleanup completed successfully")
             return True
         except Exception as e:
@@ -202,11 +370,281 @@ class SQSProcessor:
             return False
 
 
+def remove_path(file_path):
+    try:
+        if os.path.isfile(file_path) or os.path.islink(file_path):
+            os.unlink(file_path)
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+    except Exception as e:
+        logger.error(f"Failed to delete {file_path}: {e}")
+
+
+class VisibilityHeartbeat:
+    """
+    처리 중인 메시지의 visibility timeout을 주기적으로 연장합니다.
+    긴 작업 도중 메시지가 다시 보여 다른 워커가 중복 처리하는 것을 막습니다.
+    """
+
+    def __init__(
+        self,
+        sqs,
+        queue_url,
+        receipt_handle,
+        interval=SQS_HEARTBEAT_INTERVAL,
+        visibility_timeout=SQS_VISIBILITY_TIMEOUT,
+    ):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.receipt_handle = receipt_handle
+        self.interval = interval
+        self.visibility_timeout = visibility_timeout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="sqs-heartbeat", daemon=True
+        )
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sqs.change_message_visibility(
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=self.receipt_handle,
+                    VisibilityTimeout=self.visibility_timeout,
+                )
+                logger.debug("Extended SQS message visibility")
+            except Exception as e:
+                logger.error(f"Failed to extend SQS message visibility: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class SQSWorker:
+    """
+    큐를 long polling하면서 메시지를 하나씩 처리하는 상주 워커.
+    모델은 프로세스 전역 registry에 남아 있으므로 메시지 사이에 다시 로드하지 않는다.
+    SIGTERM/SIGINT를 받으면 처리 중인 메시지까지만 끝내고 종료한다.
+    """
+
+    def __init__(self, queue_url=None, s3=None, sqs=None):
+        self.queue_url = queue_url or os.getenv("SQS_QUEUE_URL")
+        self.s3 = s3 or make_s3_client(
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        )
+        self.sqs = sqs or make_sqs_client()
+        self._stop = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        logger.info("Shutdown requested, finishing current message")
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def receive(self):
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            WaitTimeSeconds=SQS_WAIT_TIME_SECONDS,
+            VisibilityTimeout=SQS_VISIBILITY_TIMEOUT,
+        )
+        return response.get("Messages", [])
+
+    def handle_message(self, message):
+        """메시지 하나를 처리합니다. 성공하면 process_song_request가 메시지를 삭제합니다."""
+        try:
+            request_data = request_data_from_message(message["Body"])
+        except (KeyError, ValueError) as e:
+            # 형식이 잘못된 메시지는 재시도해도 실패하므로 DLQ 정책에 맡기고 로그만 남긴다.
+            logger.error(f"Invalid message {message.get('MessageId')}: {e}")
+            self.failed += 1
+            return False
+
+        processor = SQSProcessor(
+            request_data, message["ReceiptHandle"], s3=self.s3, sqs=self.sqs
+        )
+        processor.queue_url = self.queue_url
+        logger.info(f"Processing request {request_data['requestId']}")
+        with VisibilityHeartbeat(self.sqs, self.queue_url, message["ReceiptHandle"]):
+            ok = processor.process_song_request()
+        processor.cleanup()
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+            logger.error(f"Failed to process request {request_data['requestId']}")
+        return ok
+
+    def run(self, max_messages=None):
+        """stop()이 불리거나 max_messages개를 처리할 때까지 큐를 돌립니다."""
+        logger.info(f"SQS worker started: {self.queue_url}")
+        while not self._stop.is_set():
+            if max_messages is not None and self.processed + self.failed >= max_messages:
+                break
+            try:
+                messages = self.receive()
+            except Exception as e:
+                logger.error(f"Failed to receive SQS messages: {e}")
+                self._stop.wait(5)
+                continue
+            for message in messages:
+                self.handle_message(message)
+        logger.info(
+            f"SQS worker stopped: processed={self.processed}, failed={self.failed}, "
+            f"RMVPE load count={rmvpe_load_count()}"
+        )
+
+
+class ScheduledSQSWorker(SQSWorker):
+    """
+    메시지를 StagedScheduler로 넘겨 여러 요청의 다운로드/추론/후처리/업로드를 겹쳐 돌리는 워커.
+    첫 단계 대기열에 자리가 있을 때만 메시지를 받아온다.
+    """
+
+    def __init__(self, queue_url=None, s3=None, sqs=None):
+        super().__init__(queue_url, s3, sqs)
+        self._lock = threading.Lock()
+        self._guide_refs = {}
+        self.scheduler = StagedScheduler(
+            [
+                Stage("download", self._stage("stage_download"), SCHEDULER_DOWNLOAD_WORKERS),
+                Stage("inference", self._stage("stage_inference"), SCHEDULER_INFERENCE_WORKERS),
+                Stage("postprocess", self._stage("stage_postprocess"), SCHEDULER_POSTPROCESS_WORKERS),
+                Stage("upload", self._stage("stage_upload"), SCHEDULER_UPLOAD_WORKERS),
+            ],
+            on_done=self._job_done,
+            on_error=self._job_failed,
+        )
+
+    @staticmethod
+    def _stage(method_name):
+        # 요청의 trace를 단계를 실행하는 스레드에 이어 붙인다.
+        def run(processor):
+            with collector.bind(processor.trace):
+                getattr(processor, method_name)()
+
+        return run
+
+    def _start_job(self, message):
+        try:
+            request_data = request_data_from_message(message["Body"])
+        except (KeyError, ValueError) as e:
+            logger.error(f"Invalid message {message.get('MessageId')}: {e}")
+            with self._lock:
+                self.failed += 1
+            return None
+
+        processor = SQSProcessor(
+            request_data, message["ReceiptHandle"], s3=self.s3, sqs=self.sqs
+        )
+        processor.queue_url = self.queue_url
+        processor.uploader = None
+        processor.trace = processor.make_trace()
+        processor.heartbeat = VisibilityHeartbeat(
+            self.sqs, self.queue_url, message["ReceiptHandle"]
+        ).__enter__()
+        with self._lock:
+            guide_id = request_data["guideId"]
+            self._guide_refs[guide_id] = self._guide_refs.get(guide_id, 0) + 1
+        logger.info(f"Scheduled request {request_data['requestId']}")
+        return processor
+
+    def _end_job(self, processor):
+        processor.release_locks()
+        processor.heartbeat.__exit__(None, None, None)
+        processor.finish_trace(processor.trace)
+        with self._lock:
+            guide_id = processor.request_data["guideId"]
+            self._guide_refs[guide_id] -= 1
+            last_user = self._guide_refs[guide_id] == 0
+            if last_user:
+                del self._guide_refs[guide_id]
+        processor.cleanup_request(remove_guide=last_user)
+
+    def _job_done(self, processor):
+        self._end_job(processor)
+        with self._lock:
+            self.processed += 1
+
+    def _job_failed(self, processor, stage_name, e):
+        logger.error(
+            f"Request {processor.request_data['requestId']} failed at {stage_name}: {e}"
+        )
+        if processor.uploader is not None:
+            processor.uploader.cancel()
+        self._end_job(processor)
+        with self._lock:
+            self.failed += 1
+
+    def run(self, max_messages=None):
+        logger.info(f"Scheduled SQS worker started: {self.queue_url}")
+        self.scheduler.start()
+        received = 0
+        while not self._stop.is_set():
+            if max_messages is not None and received >= max_messages:
+                break
+            if not self.scheduler.has_capacity():
+                self._stop.wait(1)
+                continue
+            try:
+                messages = self.receive()
+            except Exception as e:
+                logger.error(f"Failed to receive SQS messages: {e}")
+                self._stop.wait(5)
+                continue
+            for message in messages:
+                received += 1
+                processor = self._start_job(message)
+                if processor is not None:
+                    self.scheduler.submit(processor)
+        # 이미 받은 메시지는 끝까지 처리하고 종료한다.
+        self.scheduler.shutdown(wait=True)
+        logger.info(
+            f"Scheduled SQS worker stopped: processed={self.processed}, failed={self.failed}, "
+            f"RMVPE load count={rmvpe_load_count()}"
+        )
+
+
+def run_worker():
+    """상주 워커 모드 실행 함수 (WORKER_MODE=1 또는 --worker)"""
+    # SCHEDULER_ENABLED=1이면 여러 요청의 단계를 겹쳐 돌린다.
+    if os.getenv("SCHEDULER_ENABLED", "0") == "1":
+        worker = ScheduledSQSWorker()
+    else:
+        worker = SQSWorker()
+    worker.install_signal_handlers()
+
+    # Hubert/RMVPE를 한 번만 올려두고 메시지 사이에 재사용한다.
+    try:
+        warmup_models()
+    except Exception as e:
+        logger.error(f"Model warm-up failed, models will load lazily: {e}")
+
+    worker.run()
+    sys.exit(0)
+
+
 def main():
     """메인 실행 함수"""
     try:
         processor = SQSProcessor()
 
+        # Hubert/RMVPE를 미리 로드해 첫 추론의 모델 로드 비용을 없앤다.
+        try:
+            warmup_models()
+        except Exception as e:
+            logger.error(f"Model warm-up failed, models will load lazily: {e}")
+
         if not processor.process_song_request():
             logger.error("Failed to process song request")
             sys.exit(1)
@@ -215,6 +653,7 @@ def main():
             logger.error("Failed to cleanup resources")
             sys.exit(1)
 
+        logger.info(f"RMVPE load count: {rmvpe_load_count()}")
         logger.info("Process completed successfully")
         sys.exit(0)
 
@@ -224,4 +663,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if "--worker" in sys.argv[1:] or os.getenv("WORKER_MODE", "0") == "1":
+        run_worker()
+    else:
+        main()
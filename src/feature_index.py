@@ -0,0 +1,248 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from time import time as ttime
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 프로세스에 올려둘 faiss index 개수 (음성 모델 수 기준)
+FEATURE_INDEX_CACHE_SIZE = int(os.getenv("FEATURE_INDEX_CACHE_SIZE", "4"))
+
+# 검색 backend: exact(모델에 포함된 index 그대로), ivfpq, hnsw
+INDEX_BACKENDS = ("exact", "ivfpq", "hnsw")
+INDEX_BACKEND = os.getenv("RVC_INDEX_BACKEND", "exact")
+INDEX_K = int(os.getenv("RVC_INDEX_K", "8"))
+# 0이면 index에 저장된 값을 그대로 쓴다.
+INDEX_NPROBE = int(os.getenv("RVC_INDEX_NPROBE", "0")) or None
+INDEX_EF_SEARCH = int(os.getenv("RVC_INDEX_EF_SEARCH", "0")) or None
+
+_index_cache = OrderedDict()  # (index 경로, backend) -> (mtime, index, big_npy)
+_lock = threading.Lock()
+
+
+def big_npy_sidecar_path(file_index):
+    return f"{file_index}.big.npy"
+
+
+def _load_big_npy(file_index, index, mtime):
+    """
+    index.reconstruct_n 결과(big_npy)를 sidecar .npy에서 memory-map으로 엽니다.
+    sidecar가 없거나 index보다 오래됐으면 새로 만들어 저장합니다.
+    """
+    sidecar = big_npy_sidecar_path(file_index)
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= mtime:
+        try:
+            big_npy = np.load(sidecar, mmap_mode="r")
+            if big_npy.shape == (index.ntotal, index.d):
+                return big_npy
+        except Exception as e:
+            logger.warning(f"Failed to open big_npy sidecar {sidecar}: {e}")
+
+    big_npy = index.reconstruct_n(0, index.ntotal)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, big_npy)
+        os.replace(tmp_path, sidecar)
+        return np.load(sidecar, mmap_mode="r")
+    except OSError as e:
+        # 모델 폴더에 쓸 수 없으면 메모리에 올린 배열을 그대로 쓴다.
+        logger.warning(f"Failed to write big_npy sidecar {sidecar}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return big_npy
+
+
+def ann_index_path(file_index, backend):
+    # 확장자를 .index로 두면 get_rvc_model이 모델 index로 잘못 고를 수 있다.
+    return f"{file_index}.{backend}.faiss"
+
+
+def build_ann_index(big_npy, backend, nlist=None, pq_m=64, hnsw_m=32):
+    """
+    big_npy(학습 프레임 특징)로 근사 검색 index를 만듭니다.
+    행 순서를 그대로 add하므로 검색 결과 id는 big_npy 행 번호와 같습니다.
+    """
+    xb = np.ascontiguousarray(big_npy, dtype="float32")
+    n, d = xb.shape
+    if backend == "ivfpq":
+        if nlist is None:
+            nlist = max(1, min(int(16 * np.sqrt(n)), n // 39))
+        # PQ 코드북(2**nbits개) 학습에 충분한 프레임이 없으면 비트 수를 줄인다.
+        nbits = 8 if n >= 256 * 39 else 4
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, pq_m, nbits)
+        index.train(xb)
+        index.add(xb)
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+        index.hnsw.efConstruction = 200
+        index.add(xb)
+    else:
+        raise ValueError(f"Unknown ANN backend: {backend}")
+    return index
+
+
+def _load_ann_index(file_index, backend, big_npy, mtime):
+    """근사 index를 sidecar에서 읽고, 없거나 오래됐으면 만들어 저장합니다."""
+    path = ann_index_path(file_index, backend)
+    if os.path.exists(path) and os.path.getmtime(path) >= mtime:
+        try:
+            index = faiss.read_index(path)
+            if index.ntotal == big_npy.shape[0]:
+                return index
+        except Exception as e:
+            logger.warning(f"Failed to read ANN index {path}: {e}")
+
+    logger.info(f"Building {backend} index for {file_index}")
+    index = build_ann_index(big_npy, backend)
+    try:
+        faiss.write_index(index, path)
+    except Exception as e:
+        logger.warning(f"Failed to persist ANN index {path}: {e}")
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # IVF 계열이 아님
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def blend_neighbors(big_npy, score, ix):
+    """
+    검색 결과(score, ix)로 이웃 특징의 거리 역제곱 가중 평균을 구합니다.
+    IVF/HNSW는 이웃을 k개 못 찾으면 id -1을 돌려주므로 그 자리는 빼고 가중치를 다시 정규화한다.
+    (blended, found)를 반환하며, 이웃이 하나도 없는 행은 found가 False이고 blended는 0이다.
+    """
+    valid = ix >= 0
+    with np.errstate(divide="ignore"):
+        weight = np.where(valid, np.square(1 / score), 0.0)
+    total = weight.sum(axis=1, keepdims=True)
+    found = valid.any(axis=1)
+    weight = np.divide(weight, total, out=np.zeros_like(weight), where=found[:, None])
+    neighbors = big_npy[np.where(valid, ix, 0)]
+    return np.sum(neighbors * np.expand_dims(weight, axis=2), axis=1), found
+
+
+def load_feature_index(
+    file_index,
+    backend=INDEX_BACKEND,
+    nprobe=INDEX_NPROBE,
+    ef_search=INDEX_EF_SEARCH,
+):
+    """
+    faiss index와 big_npy를 (경로, mtime, backend) 기준으로 캐시해서 반환합니다.
+    같은 음성 모델로 반복 변환할 때 read_index/reconstruct_n을 건너뜁니다.
+    backend가 ivfpq/hnsw면 모델 index로부터 만든 근사 index를 반환합니다.
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend}")
+    path = os.path.abspath(file_index)
+    mtime = os.path.getmtime(path)
+    key = (path, backend)
+    with _lock:
+        cached = _index_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            _index_cache.move_to_end(key)
+            index, big_npy = cached[1], cached[2]
+        else:
+            index = faiss.read_index(path)
+            big_npy = _load_big_npy(path, index, mtime)
+            if backend != "exact":
+                try:
+                    index = _load_ann_index(path, backend, big_npy, mtime)
+                except Exception as e:
+                    logger.warning(
+                        f"Falling back to shipped index for {path} ({backend}): {e}"
+                    )
+            _index_cache[key] = (mtime, index, big_npy)
+            _index_cache.move_to_end(key)
+            while len(_index_cache) > FEATURE_INDEX_CACHE_SIZE:
+                _index_cache.popitem(last=False)
+        set_search_params(index, nprobe, ef_search)
+        return index, big_npy
+
+
+def evaluate_recall(
+    file_index,
+    backend,
+    k=INDEX_K,
+    nprobe=None,
+    ef_search=None,
+    queries=None,
+    n_queries=1000,
+    seed=0,
+):
+    """
+    backend 검색 결과를 brute-force(IndexFlatL2) 결과와 비교해 recall@k와 검색 시간을 반환합니다.
+    queries를 주지 않으면 학습 프레임 일부에 노이즈를 섞어 질의로 씁니다.
+    """
+    index, big_npy = load_feature_index(file_index, backend, nprobe, ef_search)
+    xb = np.ascontiguousarray(big_npy, dtype="float32")
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        rows = xb[rng.choice(xb.shape[0], min(n_queries, xb.shape[0]), replace=False)]
+        noise = rng.normal(0, 1, rows.shape) * (0.1 * xb.std(axis=0))
+        queries = (rows + noise).astype("float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+
+    exact = faiss.IndexFlatL2(xb.shape[1])
+    exact.add(xb)
+    t0 = ttime()
+    _, exact_ix = exact.search(queries, k)
+    t1 = ttime()
+    _, ix = index.search(queries, k)
+    t2 = ttime()
+
+    hits = sum(
+        len(set(row.tolist()) & set(exact_row.tolist()))
+        for row, exact_row in zip(ix, exact_ix)
+    )
+    return {
+        "backend": backend,
+        "k": k,
+        "nprobe": nprobe,
+        "ef_search": ef_search,
+        "ntotal": int(xb.shape[0]),
+        "n_queries": int(queries.shape[0]),
+        "recall": hits / float(queries.shape[0] * k),
+        "exact_ms_per_query": (t1 - t0) * 1000 / queries.shape[0],
+        "backend_ms_per_query": (t2 - t1) * 1000 / queries.shape[0],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build an approximate faiss index for an RVC .index file and report recall against exact search."
+    )
+    parser.add_argument("file_index", type=str, help="Path to the voice model .index file")
+    parser.add_argument("--backend", type=str, default="hnsw", choices=INDEX_BACKENDS)
+    parser.add_argument("--k", type=int, default=INDEX_K)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    parser.add_argument("--n-queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            evaluate_recall(
+                args.file_index,
+                args.backend,
+                k=args.k,
+                nprobe=args.nprobe,
+                ef_search=args.ef_search,
+                n_queries=args.n_queries,
+            ),
+            indent=2,
+        )
+    )
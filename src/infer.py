@@ -1,5 +1,4 @@
 # infer.py
-import io
 import os
 import sys
 import re
@@ -7,14 +6,18 @@ import json
 import sox
 import shutil
 import logging
+import threading
 import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from botocore.exceptions import NoCredentialsError
-from main import voice_change
+from drive_cache import drive_cache
+from main import voice_change_multi
+from instrumentation import collector
 from post_process_audio import apply_reverb, mix_audio
 from dotenv import load_dotenv
 
@@ -29,6 +32,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Drive 폴더 다운로드 동시 파일 수 / MediaIoBaseDownload chunk 크기
+DRIVE_DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "8"))
+DRIVE_DOWNLOAD_CHUNK_MB = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_MB", "32"))
+# md5Checksum/modifiedTime은 drive_cache의 신선도 판단에 쓴다.
+DRIVE_LIST_FIELDS = "id, name, mimeType, md5Checksum, modifiedTime, size"
+
 s3_client = boto3.client(
     "s3",
     aws_access_key_id="YOUR_ACCESS_KEY",
@@ -114,45 +123,94 @@ def download_folder_by_folder_id(service, folder_id, destination_folder):
             download_file(service, item["id"], file_destination)
 
 
-def download_google_drive_folder(service, folder_id, local_path, folder_name=None):
-    """
-    Google Drive의 특정 폴더를 로컬에 다운로드합니다.
+_drive_local = threading.local()
+# 스레드별 Drive 서비스(get_thread_drive_service)를 요청 사이에도 재사용하도록 프로세스 전역으로 둔다.
+_drive_executor = ThreadPoolExecutor(
+    max_workers=DRIVE_DOWNLOAD_WORKERS, thread_name_prefix="drive-download"
+)
 
-    Args:
-        service: Google Drive API 서비스 객체
-        folder_id (str): Google Drive 폴더 ID
-        local_path (str): 다운로드할 로컬 경로
-        folder_name (str, optional): 다운로드할 특정 하위 폴더 이름. 지정 시 해당 폴더를 찾아 폴더 구조대로 다운로드
-    """
+DRIVE_FOLDER_MIME = "application/vnd.google-apps.folder"
 
-    def download_file(file_metadata, path):
-        """개별 파일을 다운로드합니다."""
-        file_id = file_metadata["id"]
-        file_name = file_metadata["name"]
-        file_path = os.path.join(path, file_name)
 
-        if "google-apps" in file_metadata["mimeType"]:
-            return
+def get_thread_drive_service():
+    # googleapiclient(httplib2) 서비스 객체는 스레드 간에 공유하면 안 된다.
+    service = getattr(_drive_local, "service", None)
+    if service is None:
+        service = connect_to_google_drive()
+        _drive_local.service = service
+    return service
 
-        request = service.files().get_media(fileId=file_id)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
 
-        try:
+def list_drive_folder(service, folder_id, fields=DRIVE_LIST_FIELDS):
+    """폴더 안의 항목을 nextPageToken을 따라가며 모두 반환합니다."""
+    items = []
+    page_token = None
+    while True:
+        results = (
+            service.files()
+            .list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields=f"nextPageToken, files({fields})",
+                pageSize=1000,
+                orderBy="folder,name",
+                pageToken=page_token,
+            )
+            .execute()
+        )
+        items.extend(results.get("files", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return items
+
+
+def download_drive_file(file_metadata, file_path, service=None):
+    """
+    Drive 파일을 file_path.part에 chunk 단위로 바로 쓰고, 끝나면 이름을 바꿉니다.
+    중간에 실패해도 완성되지 않은 파일이 file_path에 남지 않습니다.
+    """
+    service = service or get_thread_drive_service()
+    request = service.files().get_media(fileId=file_metadata["id"])
+    part_path = f"{file_path}.part"
+    try:
+        with open(part_path, "wb") as f:
+            downloader = MediaIoBaseDownload(
+                f, request, chunksize=DRIVE_DOWNLOAD_CHUNK_MB * 1024 * 1024
+            )
             done = False
             while not done:
                 status, done = downloader.next_chunk()
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path
 
-            fh.seek(0)
-            with open(file_path, "wb") as f:
-                f.write(fh.read())
 
-        except Exception as e:
-            print(f"Error downloading {file_name}: {str(e)}")
+def fetch_drive_file(file_metadata, file_path):
+    # 캐시가 켜져 있으면 같은 버전 파일은 다시 받지 않는다.
+    if drive_cache is None:
+        return download_drive_file(file_metadata, file_path)
+    return drive_cache.fetch(file_metadata, file_path, download_drive_file)
+
+
+def download_google_drive_folder(service, folder_id, local_path, folder_name=None):
+    """
+    Google Drive의 특정 폴더를 로컬에 다운로드합니다.
+
+    폴더 구조는 먼저 (페이지를 끝까지 따라가며) 훑고, 파일은 공용 스레드 풀
+    (DRIVE_DOWNLOAD_WORKERS개)에서 동시에 받습니다.
+
+    Args:
+        service: Google Drive API 서비스 객체
+        folder_id (str): Google Drive 폴더 ID
+        local_path (str): 다운로드할 로컬 경로
+        folder_name (str, optional): 다운로드할 특정 하위 폴더 이름. 지정 시 해당 폴더를 찾아 폴더 구조대로 다운로드
+    """
 
     def find_specific_folder(parent_folder_id, target_folder_name):
         """특정 이름의 하위 폴더를 찾습니다."""
-        query = f"'{parent_folder_id}' in parents and name = '{target_folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+        query = f"'{parent_folder_id}' in parents and name = '{target_folder_name}' and mimeType = '{DRIVE_FOLDER_MIME}' and trashed = false"
         results = (
             service.files()
             .list(q=query, fields="files(id, name)", pageSize=1)
@@ -162,234 +220,295 @@ def download_google_drive_folder(service, folder_id, local_path, folder_name=Non
         items = results.get("files", [])
         return items[0] if items else None
 
-    def process_folder(folder_id, current_path):
-        """폴더 내의 모든 파일과 하위 폴더를 재귀적으로 처리합니다."""
-        # print(f"\nProcessing folder: {folder_id}")
-        # print(f"Local path: {current_path}")
-
-        if not os.path.exists(current_path):
-            os.makedirs(current_path)
-            # print(f"Created directory: {current_path}")
-
+    def collect_files(folder_id, current_path, files):
+        """폴더를 재귀적으로 훑어 (파일 메타데이터, 로컬 경로) 목록을 모읍니다."""
+        os.makedirs(current_path, exist_ok=True)
         try:
-            # trashed = false 조건 추가하고 파일 정렬
-            query = f"'{folder_id}' in parents and trashed = false"
-            # print(f"Executing query: {query}")
-
-            results = (
-                service.files()
-                .list(
-                    q=query,
-                    fields="nextPageToken, files(id, name, mimeType)",
-                    pageSize=1000,
-                    orderBy="folder,name",
-                )
-                .execute()
-            )
-
-            items = results.get("files", [])
-            # print(f"Found {len(items)} items in folder")
-
-            if not items:
-                # print("No files found in this folder.")
-                return
-
-            for item in items:
-                # print(f"\nProcessing item: {item['name']} ({item['mimeType']})")
-
-                if item["mimeType"] == "application/vnd.google-apps.folder":
-                    new_folder_path = os.path.join(current_path, item["name"])
-                    # print(f"Found subfolder: {item['name']}")
-                    process_folder(item["id"], new_folder_path)
-                else:
-                    download_file(item, current_path)
-
+            items = list_drive_folder(service, folder_id)
         except Exception as e:
-            print(f"Error processing folder {folder_id}: {str(e)}")
-
-    # print(f"Starting download process")
+            logger.error(f"Error processing folder {folder_id}: {str(e)}")
+            return
+        for item in items:
+            if item["mimeType"] == DRIVE_FOLDER_MIME:
+                collect_files(item["id"], os.path.join(current_path, item["name"]), files)
+            elif "google-apps" not in item["mimeType"]:
+                files.append((item, os.path.join(current_path, item["name"])))
 
     if folder_name:
-        # print(f"Searching for specific folder: {folder_name}")
         folder_info = find_specific_folder(folder_id, folder_name)
 
-        if folder_info:
-            # print(f"Found folder '{folder_name}'. Starting download...")
-            # 상위 폴더 생성하고 그 안에 target 폴더 생성
-            target_path = os.path.join(local_path, folder_name)
-            process_folder(folder_info["id"], target_path)
-        else:
+        if not folder_info:
             print(
                 f"Error: Folder '{folder_name}' not found in the specified parent folder"
             )
             return
+        # 상위 폴더 생성하고 그 안에 target 폴더 생성
+        root_id, root_path = folder_info["id"], os.path.join(local_path, folder_name)
     else:
-        # print(f"Downloading entire folder {folder_id} to {local_path}")
-        process_folder(folder_id, local_path)
+        root_id, root_path = folder_id, local_path
 
-    # print("Download process completed")
+    files = []
+    collect_files(root_id, root_path, files)
+
+    futures = {
+        _drive_executor.submit(fetch_drive_file, item, file_path): item
+        for item, file_path in files
+    }
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Error downloading {futures[future]['name']}: {str(e)}")
+    logger.info(f"Downloaded {len(files)} files from Drive folder {root_id}")
 
 
 def check_audio_samplerate(file_path, location_msg):
     """
-    [DEBUG] 오디오 파일의 샘플레이트를 체크하는 함수
-    나중에 삭제 예정
+    오디오 파일의 샘플레이트/길이를 계측 수집기에 기록합니다.
+    PIPELINE_PROFILE이 꺼져 있으면 아무것도 하지 않고, 켜져 있어도 헤더만 읽습니다.
     """
-    try:
-        tfm = sox.Transformer()
-        sample_rate = tfm.stat(file_path).sample_rate
-        logger.info(f"[DEBUG_SAMPLERATE] {location_msg} - File: {file_path}, Sample Rate: {sample_rate}Hz")
-    except Exception as e:
-        logger.error(f"[DEBUG_SAMPLERATE] Error checking sample rate for {file_path}: {str(e)}")
+    collector.audio_file(location_msg, file_path)
+
+
+# 모델에 맞는 pitch 값
+PITCH_VALUES_BY_MODEL = {
+    "ljb": [-1, 0, 1],
+    "ssk": [-2, -1,0],
+    "ssh": [0, 1],
+    "iu_new": [0, 1, 2],
+    "kimdr" : [-3,-2-1,0],
+    "kgs" : [-3,-2,-1,0],
+    "bol4" : [0,1,2],
+    "akmu_suhyeon" : [0,1],
+    "baekyerin" : [0,1],
+    "imchangjung" : [0,1,2],
+    "isu" : [1,2,3],
+    "jannabi" : [-1,0,1],
+    "minkyunghoon" : [0,1],
+    "naul" : [1,2],
+    "newjeans_haerin" : [0,1],
+    "newjeans_minji" : [0,1],
+    "newjeans_hanni" : [0,1],
+    "newjeans_danielle" : [0,1],
+    "newjeans_hein" : [0,1],
+    "nmixx_sullyoon" : [0,1],
+    "nmixx_haewon" : [0,1],
+    "ohyuk_v2" : [-1,0,1],
+    "parkhyosin12_v2" : [-1,0,1],
+    "phs03" : [0,1],
+    "taeyeon" : [0,1],
+    "yb_v2" : [0,1,2],
+    "yunha" : [0,1]
+}
+
+
+GUIDES_DIR = "/app/guides"
+RVC_MODELS_DIR = "/app/rvc_models"
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def cover_job_locks(guide_id, voice_model):
+    """
+    가이드 폴더와 보이스 모델 폴더의 lock을 항상 같은 순서(가이드, 모델)로 반환합니다.
+    여러 요청을 겹쳐 돌릴 때 다운로드부터 추론이 끝날 때까지 잡아서, 다른 요청이
+    같은 공용 경로에 파일을 다시 놓는 동안 추론이 읽지 않게 한다.
+    """
+    paths = [f"{GUIDES_DIR}/{guide_id}", f"{RVC_MODELS_DIR}/{voice_model}"]
+    with _path_locks_guard:
+        return [_path_locks.setdefault(path, threading.Lock()) for path in paths]
 
 
-def infer_ai_cover(
-    request_id, request_user_id, song_title, guide_id, voice_model, isMan
-):
-    logger.info(
-        f"Starting inference with parameters: request_id={request_id}, guide_id={guide_id}, voice_model={voice_model}"
-    )
+def prepare_cover_job(request_id, song_title, guide_id, voice_model):
+    """
+    가이드 폴더와 보이스 모델을 받고 pitch별 결과 폴더를 만듭니다. (다운로드 단계)
+    이후 단계가 이어서 쓰는 작업 정보(dict)를 반환합니다.
+    """
+    # 1. 가이드 폴더 다운
+    logger.info("가이드 폴더 다운 시작")
+    drive_service = connect_to_google_drive()
 
-    song_urls = []
+    # 특정 폴더의 ID와 다운로드할 경로를 설정합니다.
+    folder_id = guide_id  # 폴더 ID로 변경
+    destination_folder = f"{GUIDES_DIR}/{guide_id}"  # 다운로드할 경로로 변경
 
-    try:
-        # 1. 가이드 폴더 다운
-        logger.info("가이드 폴더 다운 시작")
-        drive_service = connect_to_google_drive()
+    # 다운로드할 폴더를 생성합니다.
+    os.makedirs(destination_folder, exist_ok=True)
 
-        # 특정 폴더의 ID와 다운로드할 경로를 설정합니다.
-        folder_id = guide_id  # 폴더 ID로 변경
-        destination_folder = f"/app/guides/{guide_id}"  # 다운로드할 경로로 변경
+    # 폴더 내 모든 파일을 다운로드합니다.
+    with collector.stage("drive_download.guide", guide_id=guide_id):
+        download_google_drive_folder(drive_service, folder_id, destination_folder)
+    logger.info("가이드 폴더 다운 완료")
+    # 2. 파일 경로를 숫자에 따라 정렬
 
-        # 다운로드할 폴더를 생성합니다.
-        os.makedirs(destination_folder, exist_ok=True)
+    # 다운로드된 가이드 폴더 찾기 (서브디렉토리)
+    guide_folders = os.listdir(destination_folder)
+    # scan_directory("/app/guides")
 
-        # 폴더 내 모든 파일을 다운로드합니다.
-        download_google_drive_folder(drive_service, folder_id, destination_folder)
-        logger.info("가이드 폴더 다운 완료")
-        # 2. 파일 경로를 숫자에 따라 정렬
-
-        # 다운로드된 가이드 폴더 찾기 (서브디렉토리)
-        guide_folders = os.listdir(destination_folder)
-        # scan_directory("/app/guides")
-
-        sorted_input_paths = process_guide_folders(guide_folders, destination_folder)
-
-        # 모델에 맞는 pitch 값을 가져옵니다.
-        pitch_values_by_model = {
-            "ljb": [-1, 0, 1],
-            "ssk": [-2, -1,0],
-            "ssh": [0, 1],
-            "iu_new": [0, 1, 2],
-            "kimdr" : [-3,-2-1,0],
-            "kgs" : [-3,-2,-1,0],
-            "bol4" : [0,1,2],
-            "akmu_suhyeon" : [0,1],
-            "baekyerin" : [0,1],
-            "imchangjung" : [0,1,2],
-            "isu" : [1,2,3],
-            "jannabi" : [-1,0,1],
-            "minkyunghoon" : [0,1],
-            "naul" : [1,2],
-            "newjeans_haerin" : [0,1],
-            "newjeans_minji" : [0,1],
-            "newjeans_hanni" : [0,1],
-            "newjeans_danielle" : [0,1],
-            "newjeans_hein" : [0,1],
-            "nmixx_sullyoon" : [0,1],
-            "nmixx_haewon" : [0,1],
-            "ohyuk_v2" : [-1,0,1],
-            "parkhyosin12_v2" : [-1,0,1],
-            "phs03" : [0,1],
-            "taeyeon" : [0,1],
-            "yb_v2" : [0,1,2],
-            "yunha" : [0,1]
-        }
+    sorted_input_paths = process_guide_folders(guide_folders, destination_folder)
 
-        if voice_model in pitch_values_by_model:
-            model_pitch_values = pitch_values_by_model[voice_model]
-        else:
-            model_pitch_values = [0]
+    if voice_model in PITCH_VALUES_BY_MODEL:
+        model_pitch_values = PITCH_VALUES_BY_MODEL[voice_model]
+    else:
+        model_pitch_values = [0]
 
-        # 보이스 모델 다운로드
-        logger.info("보이스 모델 다운로드")
+    # 보이스 모델 다운로드
+    logger.info("보이스 모델 다운로드")
+    with collector.stage("drive_download.voice_model", voice_model=voice_model):
         download_google_drive_folder(
             drive_service,
             "1nlUfim_6GH3OsQrokITpLGISDoiMpT8X",
-            "/app/rvc_models",
+            RVC_MODELS_DIR,
             voice_model,
         )
 
-        # 추론 시작
-        for pitch_value in model_pitch_values:
-            # 결과물 생성 폴더
-            result_folder = (
-                f"./temp/{request_id}/[{pitch_value}][{voice_model}]{song_title}"
-            )
-            os.makedirs(result_folder)
-            logger.info(
-                f"추론 + mr처리 + 믹싱 시작 : pitch={pitch_value}, model={voice_model}, title={song_title}"
+    # pitch별 결과물 생성 폴더
+    result_folders = {}
+    for pitch_value in model_pitch_values:
+        result_folder = (
+            f"./temp/{request_id}/[{pitch_value}][{voice_model}]{song_title}"
+        )
+        os.makedirs(result_folder)
+        result_folders[pitch_value] = result_folder
+
+    return {
+        "request_id": request_id,
+        "song_title": song_title,
+        "voice_model": voice_model,
+        "input_paths": sorted_input_paths,
+        "pitch_values": model_pitch_values,
+        "result_folders": result_folders,
+        "song_urls_by_pitch": {pitch_value: [] for pitch_value in model_pitch_values},
+    }
+
+
+def convert_segment(job, index, input_path):
+    """가이드 segment 하나를 모든 pitch로 변환합니다. (GPU 추론 단계)"""
+    # 입력 파일 체크
+    check_audio_samplerate(input_path, "Before voice_change - Input vocal")
+
+    file_name = os.path.basename(input_path)
+    output_paths = {
+        pitch_value: f"{job['result_folders'][pitch_value]}/{file_name}"
+        for pitch_value in job["pitch_values"]
+    }
+    try:
+        # Hubert/f0/faiss는 가이드당 한 번만 계산하고 pitch별로 합성만 반복
+        with collector.stage("voice_change", file=file_name):
+            voice_change_multi(
+                job["voice_model"],
+                input_path,
+                output_paths,
+                f0_method="rmvpe",
+                index_rate=0.66,
+                filter_radius=3,
+                rms_mix_rate=0.25,
+                protect=0.33,
+                crepe_hop_length=128,
+                is_webui=0,
             )
-            for index, input_path in enumerate(sorted_input_paths):
-                # 입력 파일 체크
-                check_audio_samplerate(input_path, "Before voice_change - Input vocal")
-                
-                file_name = os.path.basename(input_path)
-                output_path = f"{result_folder}/{file_name}"
-                try:
-                    voice_change(
-                        voice_model,
-                        input_path,
-                        output_path,
-                        pitch_value,
-                        f0_method="rmvpe",
-                        index_rate=0.66,
-                        filter_radius=3,
-                        rms_mix_rate=0.25,
-                        protect=0.33,
-                        crepe_hop_length=128,
-                        is_webui=0,
-                    )
-                    # 음성 변환 후 체크
-                    check_audio_samplerate(output_path, "After voice_change - Output vocal")
-
-                except Exception as e:
-                    print(f"추론 중 에러 발생: {str(e)}")
-                    raise
-
-                # mr 처리
-                try:
-                    mr_input_path = os.path.dirname(input_path)
-                    check_audio_samplerate(f"{mr_input_path}/{file_name.replace('_vocal.mp3', '_mr.mp3')}", "Before MR processing")
-                    
-                    mr_output_path = result_folder
-                    mr_file_path = process_mr_files(
-                        mr_input_path, mr_output_path, pitch_value
-                    )
-                    
-                    check_audio_samplerate(mr_file_path, "After MR processing")
-                except Exception as e:
-                    print(f"MR 처리중 오류: {str(e)}")
-                    raise
-
-                # 믹싱
-                # 리버브 적용 전후 체크
-                check_audio_samplerate(output_path, "Before reverb")
-                ai_vocal_path = apply_reverb(result_folder,index,file_name)
-                check_audio_samplerate(ai_vocal_path, "After reverb")
-                real_file_name = file_name.replace("_vocal.mp3", "")
-                # mix_audio(
-                #     ai_vocal_path,
-                #     mr_file_path,
-                #     f"{result_folder}/[{pitch_value}][{voice_model}]{index}_{song_title}_result.mp3",
-                # )
-                audioPair = {
-                    "mrUrl" : f"https://song-request-bucket-1.s3.ap-northeast-2.amazonaws.com//song-requests/{request_id}/[{pitch_value}][{voice_model}]{song_title}/{real_file_name}_mr.mp3",
-                    "vocalUrl" : f"https://song-request-bucket-1.s3.ap-northeast-2.amazonaws.com//song-requests/{request_id}/[{pitch_value}][{voice_model}]{song_title}/{real_file_name}_reverb.mp3",
-                }
-                song_urls.append(audioPair)
-
-        result_path = f"./temp/{request_id}"
+        # 변환 결과의 샘플레이트/길이는 rvc_infer_multi가 메모리에서 기록한다.
+
+    except Exception as e:
+        print(f"추론 중 에러 발생: {str(e)}")
+        raise
+
+    return {
+        "index": index,
+        "input_path": input_path,
+        "file_name": file_name,
+        "output_paths": output_paths,
+    }
+
+
+def postprocess_segment(job, segment, on_pair_ready=None):
+    """변환된 segment의 pitch별 mr 처리와 리버브를 적용합니다. (CPU 후처리 단계)"""
+    request_id = job["request_id"]
+    voice_model = job["voice_model"]
+    song_title = job["song_title"]
+    index = segment["index"]
+    input_path = segment["input_path"]
+    file_name = segment["file_name"]
+
+    for pitch_value in job["pitch_values"]:
+        result_folder = job["result_folders"][pitch_value]
+        output_path = segment["output_paths"][pitch_value]
+
+        # mr 처리
+        try:
+            mr_input_path = os.path.dirname(input_path)
+            check_audio_samplerate(f"{mr_input_path}/{file_name.replace('_vocal.mp3', '_mr.mp3')}", "Before MR processing")
+
+            mr_output_path = result_folder
+            with collector.stage("mr", pitch=pitch_value, file=file_name):
+                mr_file_path = process_mr_files(
+                    mr_input_path, mr_output_path, pitch_value
+                )
+
+            check_audio_samplerate(mr_file_path, "After MR processing")
+        except Exception as e:
+            print(f"MR 처리중 오류: {str(e)}")
+            raise
+
+        # 믹싱
+        # 리버브 적용 전후 체크
+        check_audio_samplerate(output_path, "Before reverb")
+        with collector.stage("reverb", pitch=pitch_value, file=file_name):
+            ai_vocal_path = apply_reverb(result_folder,index,file_name)
+        check_audio_samplerate(ai_vocal_path, "After reverb")
+        real_file_name = file_name.replace("_vocal.mp3", "")
+        # mix_audio(
+        #     ai_vocal_path,
+        #     mr_file_path,
+        #     f"{result_folder}/[{pitch_value}][{voice_model}]{index}_{song_title}_result.mp3",
+        # )
+        audioPair = {
+            "mrUrl" : f"https://song-request-bucket-1.s3.ap-northeast-2.amazonaws.com//song-requests/{request_id}/[{pitch_value}][{voice_model}]{song_title}/{real_file_name}_mr.mp3",
+            "vocalUrl" : f"https://song-request-bucket-1.s3.ap-northeast-2.amazonaws.com//song-requests/{request_id}/[{pitch_value}][{voice_model}]{song_title}/{real_file_name}_reverb.mp3",
+        }
+        job["song_urls_by_pitch"][pitch_value].append(audioPair)
+        if on_pair_ready is not None:
+            on_pair_ready(mr_file_path, ai_vocal_path)
+
+
+def finish_cover_job(job):
+    """결과 폴더 경로와 기존과 같은 pitch 순서의 audioPair 목록을 반환합니다."""
+    song_urls = []
+    for pitch_value in job["pitch_values"]:
+        song_urls.extend(job["song_urls_by_pitch"][pitch_value])
+    return f"./temp/{job['request_id']}", song_urls
+
+
+def infer_ai_cover(
+    request_id,
+    request_user_id,
+    song_title,
+    guide_id,
+    voice_model,
+    isMan,
+    on_pair_ready=None,
+):
+    """
+    on_pair_ready(mr_path, vocal_path): (mr, reverb) 한 쌍이 완성될 때마다 호출됩니다.
+    업로드를 추론과 겹쳐 돌릴 때 사용합니다.
+    """
+    logger.info(
+        f"Starting inference with parameters: request_id={request_id}, guide_id={guide_id}, voice_model={voice_model}"
+    )
+
+    try:
+        job = prepare_cover_job(request_id, song_title, guide_id, voice_model)
+
+        # 추론 시작
+        logger.info(
+            f"추론 + mr처리 + 믹싱 시작 : pitches={job['pitch_values']}, model={voice_model}, title={song_title}"
+        )
+        for index, input_path in enumerate(job["input_paths"]):
+            segment = convert_segment(job, index, input_path)
+            postprocess_segment(job, segment, on_pair_ready)
+
+        result_path, song_urls = finish_cover_job(job)
         logger.info(
             "추론 + mr처리 + 믹싱 완료 : ",
             voice_model,
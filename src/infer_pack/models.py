@@ -639,6 +639,18 @@ class SynthesizerTrnMs256NSFsid(nn.Module):
         o = self.dec((z * x_mask)[:, :, :max_len], nsff0, g=g)
         return o, x_mask, (z, z_p, m_p, logs_p)
 
+    def infer_batch(self, phone, phone_lengths, pitch, nsff0, sid, max_len=None):
+        # 같은 phone 시퀀스에 N개의 pitch 곡선을 붙여 한 번에 합성
+        # phone: [1 or N, t, c], pitch/nsff0: [N, t] -> o: [N, 1, t*upp]
+        n = pitch.shape[0]
+        if phone.shape[0] == 1 and n > 1:
+            phone = phone.expand(n, -1, -1)
+        if phone_lengths.shape[0] == 1 and n > 1:
+            phone_lengths = phone_lengths.expand(n)
+        if sid.shape[0] == 1 and n > 1:
+            sid = sid.expand(n)
+        return self.infer(phone, phone_lengths, pitch, nsff0, sid, max_len)
+
 
 class SynthesizerTrnMs768NSFsid(nn.Module):
     def __init__(
@@ -750,6 +762,18 @@ class SynthesizerTrnMs768NSFsid(nn.Module):
         o = self.dec((z * x_mask)[:, :, :max_len], nsff0, g=g)
         return o, x_mask, (z, z_p, m_p, logs_p)
 
+    def infer_batch(self, phone, phone_lengths, pitch, nsff0, sid, max_len=None):
+        # 같은 phone 시퀀스에 N개의 pitch 곡선을 붙여 한 번에 합성
+        # phone: [1 or N, t, c], pitch/nsff0: [N, t] -> o: [N, 1, t*upp]
+        n = pitch.shape[0]
+        if phone.shape[0] == 1 and n > 1:
+            phone = phone.expand(n, -1, -1)
+        if phone_lengths.shape[0] == 1 and n > 1:
+            phone_lengths = phone_lengths.expand(n)
+        if sid.shape[0] == 1 and n > 1:
+            sid = sid.expand(n)
+        return self.infer(phone, phone_lengths, pitch, nsff0, sid, max_len)
+
 
 class SynthesizerTrnMs256NSFsid_nono(nn.Module):
     def __init__(
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter, process_time, thread_time
+
+logger = logging.getLogger(__name__)
+
+# 1이면 단계별 시간/오디오 메타데이터를 debug 로그로 남긴다. 꺼져 있으면 trace 밖의 호출은 바로 반환된다.
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "0") == "1"
+# 요청마다 timing_report.json을 남길지 여부
+PIPELINE_TIMING_REPORT = os.getenv("PIPELINE_TIMING_REPORT", "1") == "1"
+# 단계 실행 중 RSS를 샘플링할 간격 (ms)
+PIPELINE_RSS_SAMPLE_MS = int(os.getenv("PIPELINE_RSS_SAMPLE_MS", "100"))
+
+_current_trace = ContextVar("pipeline_trace", default=None)
+_current_stage = ContextVar("pipeline_stage", default=())
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss_mb():
+    """지금 프로세스의 RSS(MB). ru_maxrss와 달리 요청이 끝나면 다시 내려간다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024**2
+    except OSError:
+        return 0.0
+
+
+class RssSampler:
+    """
+    관찰 중인 구간이 있는 동안만 백그라운드 스레드로 현재 RSS를 샘플링해
+    구간별 최대값을 기록합니다. RSS는 프로세스 단위라 겹쳐 도는 요청의 메모리도 포함된다.
+    """
+
+    def __init__(self, interval=PIPELINE_RSS_SAMPLE_MS / 1000):
+        self.interval = interval
+        self._watches = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def watch(self):
+        watch = RssWatch(self)
+        with self._cond:
+            self._watches.add(watch)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="rss-sampler", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+        return watch
+
+    def _release(self, watch):
+        with self._cond:
+            self._watches.discard(watch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._watches, timeout=30):
+                    self._thread = None
+                    return
+                watches = list(self._watches)
+            rss = current_rss_mb()
+            for watch in watches:
+                watch.update(rss)
+            with self._cond:
+                self._cond.wait(self.interval)
+
+
+class RssWatch:
+    def __init__(self, sampler):
+        self._sampler = sampler
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+
+    def update(self, rss):
+        if rss > self.peak_mb:
+            self.peak_mb = rss
+
+    def close(self):
+        self.update(current_rss_mb())
+        self._sampler._release(self)
+        return self.peak_mb
+
+
+_rss_sampler = RssSampler()
+
+
+class Trace:
+    """
+    요청 하나 동안 모은 단계 기록. contextvar로 현재 trace를 찾는다.
+    process_* 값은 프로세스 전체 기준이라 워커/스케줄러 모드에서는 다른 요청 몫도 섞인다.
+    요청 자신의 CPU 사용량은 stages의 thread_cpu_s 합으로 본다.
+    """
+
+    def __init__(self, name, **meta):
+        self.name = name
+        self.meta = meta
+        self.records = []
+        self._lock = threading.Lock()
+        self._t0 = perf_counter()
+        self._cpu0 = process_time()
+        self._rss = _rss_sampler.watch()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def close(self):
+        self._rss.close()
+
+    def report(self):
+        with self._lock:
+            records = list(self.records)
+        stages = [r for r in records if r["type"] == "stage"]
+        return {
+            "name": self.name,
+            **self.meta,
+            "wall_s": round(perf_counter() - self._t0, 4),
+            "thread_cpu_s": round(
+                sum(r.get("thread_cpu_s", 0) for r in stages if not r.get("nested", True)), 4
+            ),
+            "process_cpu_s": round(process_time() - self._cpu0, 4),
+            "process_rss_start_mb": round(self._rss.start_mb, 1),
+            "process_rss_peak_mb": round(self._rss.peak_mb, 1),
+            "process_rss_end_mb": round(current_rss_mb(), 1),
+            "stages": stages,
+            "audio": [r for r in records if r["type"] == "audio"],
+        }
+
+
+class Collector:
+    """
+    파이프라인 계측값을 모으는 수집기.
+    기록은 현재 trace에만 쌓이고, PIPELINE_PROFILE이면 debug 로그로도 남긴다.
+    (프로세스 전역 목록은 두지 않는다. 오래 도는 워커에서 끝없이 늘어나므로)
+
+    오디오 정보는 이미 메모리에 있는 배열 길이/샘플레이트로 기록하고,
+    파일만 있을 때도 헤더(sf.info)만 읽으므로 디코딩을 다시 하지 않는다.
+    """
+
+    def __init__(self, enabled=PIPELINE_PROFILE):
+        self.enabled = enabled
+
+    @property
+    def active(self):
+        return self.enabled or _current_trace.get() is not None
+
+    def _add(self, record):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(record)
+        if self.enabled:
+            logger.debug(f"[PROFILE] {record}")
+
+    @contextmanager
+    def stage(self, name, **meta):
+        """
+        with 블록의 wall time, 실행 스레드의 CPU time, 프로세스 RSS 변화/최대값을 name 단계로 기록합니다.
+        중첩된 단계는 parent에 바깥 단계 경로가 남습니다.
+        """
+        if not self.active:
+            yield
+            return
+        parent = _current_stage.get()
+        token = _current_stage.set(parent + (name,))
+        t0, cpu0 = perf_counter(), thread_time()
+        rss = _rss_sampler.watch()
+        try:
+            yield
+        finally:
+            _current_stage.reset(token)
+            peak = rss.close()
+            rss1 = current_rss_mb()
+            self._add(
+                {
+                    "type": "stage",
+                    "name": name,
+                    "parent": "/".join(parent),
+                    # 바깥 단계 안에 있는 단계 (trace 이름만 parent면 최상위)
+                    "nested": len(parent) > 1,
+                    "wall_s": round(perf_counter() - t0, 4),
+                    "thread_cpu_s": round(thread_time() - cpu0, 4),
+                    "process_rss_mb": round(rss1, 1),
+                    "process_rss_delta_mb": round(rss1 - rss.start_mb, 1),
+                    "process_rss_peak_mb": round(peak, 1),
+                    **meta,
+                }
+            )
+
+    def finish_trace(self, trace, report_path=None):
+        """
+        trace를 닫고 보고서를 로그로 남깁니다. report_path를 주면 JSON 파일로도 쓰고
+        파일을 썼으면 True를 반환한다. (올리거나 지우는 것은 호출하는 쪽 몫)
+        """
+        trace.close()
+        if not PIPELINE_TIMING_REPORT:
+            return False
+        report = trace.report()
+        logger.info(f"Timing report: {json.dumps(report, ensure_ascii=False)}")
+        if report_path is None:
+            return False
+        return write_report(report, report_path)
+
+    @contextmanager
+    def bind(self, trace):
+        """
+        이미 만든 trace를 현재 스레드의 기록 대상으로 지정합니다.
+        스케줄러처럼 한 요청이 여러 스레드를 거칠 때 단계마다 같은 trace를 잇는 데 쓴다.
+        """
+        token = _current_trace.set(trace)
+        stage_token = _current_stage.set((trace.name,))
+        try:
+            yield trace
+        finally:
+            _current_stage.reset(stage_token)
+            _current_trace.reset(token)
+
+    def timing(self, name, seconds, **meta):
+        """이미 측정된 시간(예: VC times 리스트)을 기록합니다."""
+        if self.active:
+            self._add(
+                {
+                    "type": "stage",
+                    "name": name,
+                    "parent": "/".join(_current_stage.get()),
+                    "wall_s": round(seconds, 4),
+                    **meta,
+                }
+            )
+
+    def audio(self, name, path, sample_rate, n_samples, **meta):
+        """메모리에 있는 오디오의 샘플레이트/길이를 기록합니다."""
+        if self.active:
+            self._add(
+                {
+                    "type": "audio",
+                    "name": name,
+                    "path": path,
+                    "sample_rate": sample_rate,
+                    "n_samples": int(n_samples),
+                    "duration_s": n_samples / float(sample_rate),
+                    **meta,
+                }
+            )
+
+    def audio_file(self, name, path):
+        """파일 헤더만 읽어 샘플레이트/길이를 기록합니다. (PIPELINE_PROFILE일 때만)"""
+        if not self.enabled:
+            return
+        try:
+            import soundfile as sf
+
+            info = sf.info(path)
+            self.audio(name, path, info.samplerate, info.frames, format=info.format)
+        except Exception as e:
+            logger.debug(f"[PROFILE] Could not read header of {path}: {e}")
+
+
+def write_report(report, report_path):
+    try:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Timing report written to {report_path}")
+        return True
+    except OSError as e:
+        logger.error(f"Failed to write timing report {report_path}: {e}")
+        return False
+
+
+collector = Collector()
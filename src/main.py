@@ -1,5 +1,4 @@
 import argparse
-import gc
 import hashlib
 import json
 import os
@@ -22,8 +21,15 @@ from pedalboard.io import AudioFile
 from pydub import AudioSegment
 
 
+from instrumentation import collector
 from mdx import run_mdx
-from rvc import Config, load_hubert, get_vc, rvc_infer
+from rvc import (
+    get_config,
+    get_cached_hubert,
+    get_cached_vc,
+    rvc_infer_multi,
+    warmup_models as warmup_rvc_models,
+)
 
 logger = logging.getLogger(__name__)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -31,6 +37,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 mdxnet_models_dir = os.path.join(BASE_DIR, "mdxnet_models")
 # rvc_models_dir = os.path.join(BASE_DIR, "rvc_models")
 rvc_models_dir = "/app/rvc_models"
+hubert_model_path = os.path.join(rvc_models_dir, "hubert_base.pt")
+rvc_device = "cuda:0"
 output_dir = os.path.join(BASE_DIR, "song_output")
 
 
@@ -207,38 +215,41 @@ def preprocess_song(
     display_progress(
         "[~] Separating Vocals from Instrumental...", 0.1, is_webui, progress
     )
-    vocals_path, instrumentals_path = run_mdx(
-        mdx_model_params,
-        song_output_dir,
-        os.path.join(mdxnet_models_dir, "UVR-MDX-NET-Voc_FT.onnx"),
-        orig_song_path,
-        denoise=True,
-        keep_orig=keep_orig,
-    )
+    with collector.stage("mdx.vocals"):
+        vocals_path, instrumentals_path = run_mdx(
+            mdx_model_params,
+            song_output_dir,
+            os.path.join(mdxnet_models_dir, "UVR-MDX-NET-Voc_FT.onnx"),
+            orig_song_path,
+            denoise=True,
+            keep_orig=keep_orig,
+        )
 
     display_progress(
         "[~] Separating Main Vocals from Backup Vocals...", 0.2, is_webui, progress
     )
-    backup_vocals_path, main_vocals_path = run_mdx(
-        mdx_model_params,
-        song_output_dir,
-        os.path.join(mdxnet_models_dir, "UVR_MDXNET_KARA_2.onnx"),
-        vocals_path,
-        suffix="Backup",
-        invert_suffix="Main",
-        denoise=True,
-    )
+    with collector.stage("mdx.backup_vocals"):
+        backup_vocals_path, main_vocals_path = run_mdx(
+            mdx_model_params,
+            song_output_dir,
+            os.path.join(mdxnet_models_dir, "UVR_MDXNET_KARA_2.onnx"),
+            vocals_path,
+            suffix="Backup",
+            invert_suffix="Main",
+            denoise=True,
+        )
 
     display_progress("[~] Applying DeReverb to Vocals...", 0.3, is_webui, progress)
-    _, main_vocals_dereverb_path = run_mdx(
-        mdx_model_params,
-        song_output_dir,
-        os.path.join(mdxnet_models_dir, "Reverb_HQ_By_FoxJoy.onnx"),
-        main_vocals_path,
-        invert_suffix="DeReverb",
-        exclude_main=True,
-        denoise=True,
-    )
+    with collector.stage("mdx.dereverb"):
+        _, main_vocals_dereverb_path = run_mdx(
+            mdx_model_params,
+            song_output_dir,
+            os.path.join(mdxnet_models_dir, "Reverb_HQ_By_FoxJoy.onnx"),
+            main_vocals_path,
+            invert_suffix="DeReverb",
+            exclude_main=True,
+            denoise=True,
+        )
 
     return (
         orig_song_path,
@@ -306,21 +317,45 @@ def voice_change(
     crepe_hop_length,
     is_webui,
 ):
+    voice_change_multi(
+        voice_model,
+        vocals_path,
+        {pitch_change: output_path},
+        f0_method,
+        index_rate,
+        filter_radius,
+        rms_mix_rate,
+        protect,
+        crepe_hop_length,
+        is_webui,
+    )
+
+
+def voice_change_multi(
+    voice_model,
+    vocals_path,
+    output_paths_by_pitch,
+    f0_method,
+    index_rate,
+    filter_radius,
+    rms_mix_rate,
+    protect,
+    crepe_hop_length,
+    is_webui,
+):
+    """
+    하나의 보컬을 여러 pitch로 변환합니다.
+    output_paths_by_pitch: {pitch_change: output_path}
+    """
     logger = logging.getLogger(__name__)
 
     try:
         logger.debug(f"Starting voice_change with parameters:")
         logger.debug(f"voice_model: {voice_model}")
         logger.debug(f"vocals_path: {vocals_path}")
-        logger.debug(f"output_path: {output_path}")
-        logger.debug(f"pitch_change: {pitch_change}")
-
-        # 파일 존재 확인 및 정보 로깅
-        logger.debug(f"Checking input file: {vocals_path}")
-        if os.path.exists(vocals_path):
-            logger.debug(f"Input file exists. Size: {os.path.getsize(vocals_path)}")
-            logger.debug(f"File permissions: {oct(os.stat(vocals_path).st_mode)[-3:]}")
-        else:
+        logger.debug(f"output_paths_by_pitch: {output_paths_by_pitch}")
+
+        if not os.path.exists(vocals_path):
             logger.error(f"Input file does not exist: {vocals_path}")
             raise FileNotFoundError(f"Input file not found: {vocals_path}")
 
@@ -331,27 +366,29 @@ def voice_change(
         logger.debug(f"RVC index path: {rvc_index_path}")
 
         # 디바이스 설정
-        device = "cuda:0"
+        device = rvc_device
         logger.debug(f"Using device: {device}")
-        config = Config(device, True)
+        config = get_config(device, True)
 
-        # Hubert 모델 로드
+        # Hubert 모델 로드 (프로세스 전역 registry에 상주)
         logger.debug("Loading Hubert model")
         try:
-            hubert_model = load_hubert(
-                device, config.is_half, "/app/rvc_models/hubert_base.pt"
-            )
+            with collector.stage("load_model.hubert"):
+                hubert_model = get_cached_hubert(
+                    device, config.is_half, hubert_model_path
+                )
             logger.debug("Hubert model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load Hubert model: {str(e)}")
             raise
 
-        # VC 모델 로드
+        # VC 모델 로드 (프로세스 전역 registry에 상주)
         logger.debug("Loading VC model")
         try:
-            cpt, version, net_g, tgt_sr, vc = get_vc(
-                device, config.is_half, config, rvc_model_path
-            )
+            with collector.stage("load_model.vc", voice_model=voice_model):
+                cpt, version, net_g, tgt_sr, vc = get_cached_vc(
+                    device, config.is_half, config, rvc_model_path
+                )
             logger.debug(f"VC model loaded successfully. Version: {version}")
         except Exception as e:
             logger.error(f"Failed to load VC model: {str(e)}")
@@ -360,24 +397,24 @@ def voice_change(
         # RVC 추론 실행
         logger.debug("Starting RVC inference")
         try:
-            rvc_infer(
-                rvc_index_path,
-                index_rate,
-                vocals_path,
-                output_path,
-                pitch_change,
-                f0_method,
-                cpt,
-                version,
-                net_g,
-                filter_radius,
-                tgt_sr,
-                rms_mix_rate,
-                protect,
-                crepe_hop_length,
-                vc,
-                hubert_model,
-            )
+            with collector.stage("rvc_infer", pitches=list(output_paths_by_pitch)):
+                rvc_infer_multi(
+                    rvc_index_path,
+                    index_rate,
+                    vocals_path,
+                    output_paths_by_pitch,
+                    f0_method,
+                    cpt,
+                    version,
+                    net_g,
+                    filter_radius,
+                    tgt_sr,
+                    rms_mix_rate,
+                    protect,
+                    crepe_hop_length,
+                    vc,
+                    hubert_model,
+                )
             logger.debug("RVC inference completed successfully")
         except Exception as e:
             logger.error(f"RVC inference failed: {str(e)}")
@@ -385,10 +422,6 @@ def voice_change(
                 logger.error(f"Stderr output: {e.stderr}")
             raise
 
-        # 메모리 정리
-        logger.debug("Cleaning up memory")
-        del hubert_model, cpt
-        gc.collect()
         logger.debug("Voice change completed successfully")
 
     except Exception as e:
@@ -398,6 +431,11 @@ def voice_change(
         raise
 
 
+def warmup_models():
+    """워커 시작 시 Hubert와 공유 RMVPE를 미리 로드합니다."""
+    warmup_rvc_models(rvc_device, True, hubert_model_path)
+
+
 def add_audio_effects(
     audio_path, reverb_rm_size, reverb_wet, reverb_dry, reverb_damping
 ):
@@ -12,7 +12,26 @@ import soundfile as sf
 import torch
 from tqdm import tqdm
 
+from model_registry import registry
+
 warnings.filterwarnings("ignore")
+
+# ONNX Runtime 세션 옵션. 0이면 onnxruntime 기본값(코어 수)을 쓴다.
+MDX_INTRA_OP_THREADS = int(os.getenv("MDX_INTRA_OP_THREADS", "0"))
+MDX_INTER_OP_THREADS = int(os.getenv("MDX_INTER_OP_THREADS", "0"))
+# disable | basic | extended | all
+MDX_GRAPH_OPT_LEVEL = os.getenv("MDX_GRAPH_OPT_LEVEL", "all")
+MDX_MEM_ARENA = os.getenv("MDX_MEM_ARENA", "1") == "1"
+# CUDA arena 확장 방식 (kNextPowerOfTwo | kSameAsRequested)
+MDX_CUDA_ARENA_STRATEGY = os.getenv("MDX_CUDA_ARENA_STRATEGY", "kNextPowerOfTwo")
+
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
 stem_naming = {'Vocals': 'Instrumental', 'Other': 'Instruments', 'Instrumental': 'Vocals', 'Drums': 'Drumless', 'Bass': 'Bassless'}
 
 
@@ -66,20 +85,32 @@ class MDX:
 
         # Set the device and the provider (CPU or CUDA)
         self.device = torch.device(f'cuda:{processor}') if processor >= 0 else torch.device('cpu')
-        self.provider = ['CUDAExecutionProvider'] if processor >= 0 else ['CPUExecutionProvider']
+        self.provider = get_providers(processor)
 
         self.model = params
 
-        # Load the ONNX model using ONNX Runtime
-        self.ort = ort.InferenceSession(model_path, providers=self.provider)
-        # Preload the model for faster performance
-        self.ort.run(None, {'input': torch.rand(1, 4, params.dim_f, params.dim_t).numpy()})
+        # Reuse the pooled ONNX Runtime session (loaded and warmed up once per model)
+        self.ort = get_session(model_path, self.provider, params)
         self.process = lambda spec: self.ort.run(None, {'input': spec.cpu().numpy()})[0]
 
         self.prog = None
 
     @staticmethod
     def get_hash(model_path):
+        # 같은 파일을 매번 다시 읽지 않도록 (경로, mtime_ns, 크기)별로 기억한다.
+        # 파일 읽기는 lock 밖에서 한다. (동시에 처음 읽으면 두 번 읽을 수 있지만 결과는 같다)
+        st = os.stat(model_path)
+        key = (os.path.abspath(model_path), st.st_mtime_ns, st.st_size)
+        with _model_hashes_lock:
+            model_hash = _model_hashes.get(key)
+        if model_hash is None:
+            model_hash = MDX._read_hash(model_path)
+            with _model_hashes_lock:
+                _model_hashes[key] = model_hash
+        return model_hash
+
+    @staticmethod
+    def _read_hash(model_path):
         try:
             with open(model_path, 'rb') as f:
                 f.seek(- 10000 * 1024, 2)
@@ -235,12 +266,73 @@ class MDX:
         return self.segment(processed_batches, True, chunk)
 
 
-def run_mdx(model_params, output_dir, model_path, filename, exclude_main=False, exclude_inversion=False, suffix=None, invert_suffix=None, denoise=False, keep_orig=True, m_threads=2):
-    device = torch.device('cuda:0') if torch.cuda.is_available() else torch.device('cpu')
+_model_hashes = {}  # (절대 경로, mtime_ns, size) -> md5
+_model_hashes_lock = threading.Lock()
+
+
+def get_providers(processor=MDX.DEFAULT_PROCESSOR):
+    """CUDA를 쓸 수 있으면 CUDA provider를, 아니면 CPU provider를 반환합니다."""
+    if (
+        processor >= 0
+        and torch.cuda.is_available()
+        and 'CUDAExecutionProvider' in ort.get_available_providers()
+    ):
+        return [('CUDAExecutionProvider', {
+            'device_id': processor,
+            'arena_extend_strategy': MDX_CUDA_ARENA_STRATEGY,
+        })]
+    return ['CPUExecutionProvider']
+
+
+def make_session_options():
+    options = ort.SessionOptions()
+    if MDX_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = MDX_INTRA_OP_THREADS
+    if MDX_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = MDX_INTER_OP_THREADS
+    options.graph_optimization_level = GRAPH_OPT_LEVELS[MDX_GRAPH_OPT_LEVEL]
+    options.enable_cpu_mem_arena = MDX_MEM_ARENA
+    return options
+
+
+def get_session(model_path, providers, params: MDXModel):
+    """
+    모델 hash + provider + 세션 옵션별로 InferenceSession을 한 번만 만들어 registry에 둡니다.
+    곡마다 세 모델을 다시 로드하고 warm-up하던 비용이 첫 곡에서만 든다.
+    """
+    key = (
+        "mdx",
+        MDX.get_hash(model_path),
+        repr(providers),
+        MDX_INTRA_OP_THREADS,
+        MDX_INTER_OP_THREADS,
+        MDX_GRAPH_OPT_LEVEL,
+        MDX_MEM_ARENA,
+    )
+
+    def loader():
+        session = ort.InferenceSession(
+            model_path, sess_options=make_session_options(), providers=providers
+        )
+        # Preload the model for faster performance
+        session.run(None, {'input': torch.rand(1, 4, params.dim_f, params.dim_t).numpy()})
+        return session
+
+    return registry.get(key, loader, nbytes=os.path.getsize(model_path))
 
-    device_properties = torch.cuda.get_device_properties(device)
-    vram_gb = device_properties.total_memory / 1024**3
-    m_threads = 1 if vram_gb < 8 else 2
+
+def run_mdx(model_params, output_dir, model_path, filename, exclude_main=False, exclude_inversion=False, suffix=None, invert_suffix=None, denoise=False, keep_orig=True, m_threads=2):
+    if torch.cuda.is_available():
+        processor = 0
+        device = torch.device('cuda:0')
+        device_properties = torch.cuda.get_device_properties(device)
+        vram_gb = device_properties.total_memory / 1024**3
+        m_threads = 1 if vram_gb < 8 else 2
+    else:
+        # CPU에서는 onnxruntime이 intra-op 스레드로 코어를 나눠 쓴다.
+        processor = -1
+        device = torch.device('cpu')
+        m_threads = 1
 
     model_hash = MDX.get_hash(model_path)
     mp = model_params.get(model_hash)
@@ -253,7 +345,7 @@ def run_mdx(model_params, output_dir, model_path, filename, exclude_main=False,
         compensation=mp["compensate"]
     )
 
-    mdx_sess = MDX(model_path, model)
+    mdx_sess = MDX(model_path, model, processor=processor)
     wave, sr = librosa.load(filename, mono=False, sr=44100)
     # normalizing input wave gives better output
     peak = max(np.max(wave), abs(np.min(wave)))
@@ -0,0 +1,137 @@
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# 상주 모델 메모리 예산 (MB). 초과 시 가장 오래 안 쓴 모델부터 내린다.
+MODEL_CACHE_BUDGET_MB = int(os.getenv("MODEL_CACHE_BUDGET_MB", "6144"))
+
+
+def estimate_nbytes(obj):
+    """모델/텐서/컨테이너가 차지하는 파라미터·버퍼 메모리를 대략 계산합니다."""
+    if isinstance(obj, torch.nn.Module):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_nbytes(v) for v in obj)
+    if hasattr(obj, "__dict__"):
+        # RMVPE처럼 모델을 속성으로 들고 있는 래퍼 객체
+        return sum(
+            estimate_nbytes(v)
+            for v in vars(obj).values()
+            if isinstance(v, (torch.nn.Module, torch.Tensor))
+        )
+    return 0
+
+
+class ModelRegistry:
+    """
+    프로세스 전역 모델 캐시.
+
+    (모델 경로, 디바이스, 정밀도 등)으로 만든 key 하나당 한 번만 로드하고,
+    총 메모리가 budget_bytes를 넘으면 LRU 순서로 내린다.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.RLock()
+        self._loading = {}  # 로드 중인 key -> key별 lock
+        self.hits = 0
+        self.misses = 0
+        self.loads = {}
+
+    def get(self, key, loader, nbytes=None):
+        """
+        key의 모델을 반환하고, 없으면 loader()로 로드합니다.
+        로드는 전역 lock 밖에서 key별 lock만 잡고 하므로 다른 모델 조회를 막지 않고,
+        같은 key를 동시에 요청하면 한 스레드만 로드하고 나머지는 그 결과를 기다린다.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    # 기다리는 동안 다른 스레드가 로드를 끝냈다.
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                self.misses += 1
+            try:
+                logger.info(f"Loading model into registry: {key}")
+                value = loader()
+                size = estimate_nbytes(value) if nbytes is None else nbytes
+                with self._lock:
+                    self._entries[key] = (value, size)
+                    self.loads[key] = self.loads.get(key, 0) + 1
+                    self._evict_over_budget(keep=key)
+                return value
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is key_lock:
+                        del self._loading[key]
+
+    def _evict_over_budget(self, keep):
+        evicted = False
+        while self.total_bytes > self.budget_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            _, size = self._entries.pop(key)
+            logger.info(f"Evicting model from registry: {key} ({size / 1024**2:.1f}MB)")
+            evicted = True
+        if evicted:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def load_count(self, kind):
+        """key[0](모델 종류)별 누적 로드 횟수. 1보다 크면 evict 후 다시 로드된 것."""
+        with self._lock:
+            return sum(n for key, n in self.loads.items() if key[0] == kind)
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": {str(key): n for key, n in self.loads.items()},
+                "resident": [str(key) for key in self._entries],
+                "total_mb": round(self.total_bytes / 1024**2, 1),
+                "budget_mb": round(self.budget_bytes / 1024**2, 1),
+            }
+
+
+registry = ModelRegistry(MODEL_CACHE_BUDGET_MB * 1024 * 1024)
@@ -2,9 +2,120 @@ import ffmpeg
 import numpy as np
 import logging
 import os
+import threading
+from collections import OrderedDict
+from math import gcd
+
+import soundfile as sf
+from scipy.signal import resample_poly
+
+# 디코딩 결과를 올려둘 파일 수 (같은 가이드 보컬을 pitch마다 다시 디코딩하지 않도록)
+AUDIO_CACHE_SIZE = int(os.getenv("AUDIO_CACHE_SIZE", "8"))
+
+# ffmpeg 파이프에서 한 번에 읽을 샘플 수 (float32, 기본 1MB)
+FFMPEG_CHUNK_SAMPLES = int(os.getenv("FFMPEG_CHUNK_SAMPLES", str(1 << 18)))
+
+_audio_cache = OrderedDict()  # (절대 경로, mtime, size, sr) -> np.ndarray (read-only)
+_audio_cache_lock = threading.Lock()
+
+
+def _decode_soundfile(file, sr):
+    """libsndfile로 프로세스 안에서 디코딩하고 필요하면 polyphase로 리샘플링합니다."""
+    data, file_sr = sf.read(file, dtype="float32", always_2d=True)
+    audio = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    if file_sr != sr:
+        g = gcd(int(file_sr), int(sr))
+        audio = resample_poly(audio, sr // g, file_sr // g).astype(np.float32)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def _ffmpeg_process(file, sr):
+    logger = logging.getLogger(__name__)
+    ffmpeg_command = (
+        ffmpeg.input(file, threads=0)
+        .output("-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr)
+        .global_args("-loglevel", "error")
+    )
+    logger.debug(f"FFmpeg command: {' '.join(ffmpeg_command.compile())}")
+    # stderr는 -loglevel error라 파이프가 찰 만큼 쌓이지 않는다.
+    return ffmpeg_command.run_async(
+        cmd=["ffmpeg", "-nostdin"], pipe_stdout=True, pipe_stderr=True
+    )
+
+
+def _finish_ffmpeg(process):
+    logger = logging.getLogger(__name__)
+    stderr = process.stderr.read()
+    returncode = process.wait()
+    if returncode != 0:
+        logger.error("FFmpeg error occurred")
+        logger.error(f"FFmpeg stderr: {stderr.decode() if stderr else 'None'}")
+        raise RuntimeError(f"FFmpeg error (see stderr output for detail)")
+    if stderr:
+        logger.debug(f"FFmpeg stderr output: {stderr.decode()}")
+
+
+def _iter_ffmpeg_chunks(file, sr, chunk_samples=FFMPEG_CHUNK_SAMPLES):
+    """
+    ffmpeg 출력을 chunk_samples 크기의 float32 배열로 바로 읽어 넣어 yield합니다.
+    (BufferedReader.readinto는 EOF 전에는 chunk를 다 채운다)
+    """
+    process = _ffmpeg_process(file, sr)
+    try:
+        while True:
+            chunk = np.empty(chunk_samples, dtype=np.float32)
+            n_bytes = process.stdout.readinto(memoryview(chunk).cast("B"))
+            if not n_bytes:
+                break
+            if n_bytes < chunk.nbytes:
+                # 마지막 chunk는 실제 길이만 복사해 남는 공간을 붙잡지 않는다.
+                # 끝이 샘플 경계가 아니면 버린다.
+                chunk = chunk[: n_bytes // 4].copy()
+            yield chunk
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    _finish_ffmpeg(process)
+
+
+def _decode_ffmpeg(file, sr, chunk_samples=FFMPEG_CHUNK_SAMPLES):
+    """
+    ffmpeg 출력을 chunk 목록으로 모은 뒤 한 번만 이어 붙입니다.
+    최대 메모리는 디코딩 결과의 약 2배입니다. (chunk 목록 + 결과 배열)
+    """
+    logger = logging.getLogger(__name__)
+    chunks = list(_iter_ffmpeg_chunks(file, sr, chunk_samples))
+    audio_data = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float32)
+    del chunks
+    logger.debug(f"Audio data shape: {audio_data.shape}")
+    return audio_data
+
+
+def decode_audio(file, sr):
+    """soundfile로 먼저 디코딩하고, 지원하지 않는 형식이면 ffmpeg로 넘깁니다."""
+    logger = logging.getLogger(__name__)
+    try:
+        audio = _decode_soundfile(file, sr)
+        logger.debug(f"Decoded with soundfile: {file} ({audio.shape[0]} samples)")
+        return audio
+    except Exception as e:
+        logger.debug(f"soundfile could not decode {file}, falling back to ffmpeg: {e}")
+    return _decode_ffmpeg(file, sr)
+
+
+def clear_audio_cache():
+    with _audio_cache_lock:
+        _audio_cache.clear()
 
 
 def load_audio(file, sr):
+    """
+    오디오 파일을 sr Hz mono float32 배열로 읽습니다.
+    결과는 (경로, mtime, 크기, sr) 기준으로 캐시되며, 공유되므로 read-only 배열입니다.
+    수정이 필요하면 호출하는 쪽에서 복사해서 쓰세요.
+    파일이 없으면 FileNotFoundError, 그 밖의 실패는 RuntimeError를 냅니다.
+    """
     logger = logging.getLogger(__name__)
 
     try:
@@ -17,53 +128,33 @@ def load_audio(file, sr):
         logger.debug(f"Cleaned file path: {file}")
 
         # 파일 존재 여부 확인
-        logger.debug(f"Checking file existence")
-        if not os.path.exists(file):
+        try:
+            st = os.stat(file)
+        except FileNotFoundError:
             logger.error(f"File not found: {file}")
             raise FileNotFoundError(f"File not found: {file}")
-        logger.debug(f"File exists. Size: {os.path.getsize(file)} bytes")
-        logger.debug(f"Absolute path: {os.path.abspath(file)}")
-
-        # ffmpeg 명령어 구성
-        logger.debug("Constructing ffmpeg command")
-        ffmpeg_command = ffmpeg.input(file, threads=0).output(
-            "-", format="f32le", acodec="pcm_f32le", ac=1, ar=sr
-        )
-        logger.debug(f"FFmpeg command: {' '.join(ffmpeg_command.compile())}")
-
-        # ffmpeg 실행
-        logger.debug("Executing ffmpeg command")
-        try:
-            out, stderr = ffmpeg_command.run(
-                cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True
-            )
-            logger.debug("FFmpeg command executed successfully")
-            if stderr:
-                logger.debug(
-                    f"FFmpeg stderr output: {stderr.decode() if isinstance(stderr, bytes) else stderr}"
-                )
-
-        except ffmpeg.Error as e:
-            logger.error("FFmpeg error occurred")
-            logger.error(f"FFmpeg stdout: {e.stdout.decode() if e.stdout else 'None'}")
-            logger.error(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'None'}")
-            raise RuntimeError(f"FFmpeg error (see stderr output for detail)")
-
-        except Exception as e:
-            logger.error(f"Unexpected error during ffmpeg execution: {str(e)}")
-            raise
-
-        # numpy 변환
-        logger.debug("Converting output to numpy array")
-        try:
-            audio_data = np.frombuffer(out, np.float32).flatten()
-            logger.debug(f"Audio data shape: {audio_data.shape}")
-            return audio_data
 
-        except Exception as e:
-            logger.error(f"Error converting output to numpy array: {str(e)}")
-            raise
+        key = (os.path.abspath(file), st.st_mtime, st.st_size, sr)
+        with _audio_cache_lock:
+            audio = _audio_cache.get(key)
+            if audio is not None:
+                _audio_cache.move_to_end(key)
+                logger.debug(f"Audio cache hit: {file}")
+                return audio
+
+        audio = decode_audio(file, sr)
+        audio.setflags(write=False)
+        if AUDIO_CACHE_SIZE > 0:
+            with _audio_cache_lock:
+                _audio_cache[key] = audio
+                _audio_cache.move_to_end(key)
+                while len(_audio_cache) > AUDIO_CACHE_SIZE:
+                    _audio_cache.popitem(last=False)
+        return audio
 
+    except FileNotFoundError:
+        # 없는 파일은 호출하는 쪽에서 구분할 수 있도록 그대로 올린다.
+        raise
     except Exception as e:
         logger.error(f"Failed to load audio: {str(e)}")
         raise RuntimeError(f"Failed to load audio: {e}")
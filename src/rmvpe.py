@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 import torch
 import torch.nn as nn
@@ -258,6 +260,25 @@ class E2E(nn.Module):
         return x
 
 
+def unet_context_frames(model):
+    """
+    E2E의 unet+cnn 출력 한 프레임이 시간축 한쪽으로 의존하는 입력 프레임 수(receptive field)를
+    32프레임 단위로 올림해 반환합니다. 기본 구조(n_blocks=4, 5단, intermediate 4)는 1632프레임.
+    """
+    encoder, intermediate = model.unet.encoder, model.unet.intermediate
+    n_blocks = encoder.layers[0].n_blocks
+    n_levels = encoder.n_encoders
+    frames = 0
+    for level in range(n_levels):
+        scale = 2**level
+        # encoder: 3x3 conv 2개 x n_blocks + avg pool, decoder: transposed conv + 3x3 conv 2개 x n_blocks
+        frames += 2 * n_blocks * scale + scale
+        frames += 2 * scale + 2 * n_blocks * scale
+    frames += 2 * n_blocks * intermediate.n_inters * 2**n_levels
+    frames += 1  # cnn
+    return 32 * ((frames - 1) // 32 + 1)
+
+
 class MelSpectrogram(torch.nn.Module):
     def __init__(
         self,
@@ -326,7 +347,7 @@ class MelSpectrogram(torch.nn.Module):
 
 
 class RMVPE:
-    def __init__(self, model_path, is_half, device=None):
+    def __init__(self, model_path, is_half, device=None, decode_on_device=False):
         self.resample_kernel = {}
         model = E2E(4, 1, (2, 2))
         ckpt = torch.load(model_path, map_location="cpu")
@@ -346,6 +367,11 @@ class RMVPE:
         self.model = self.model.to(device)
         cents_mapping = 20 * np.arange(360) + 1997.3794084376191
         self.cents_mapping = np.pad(cents_mapping, (4, 4))  # 368
+        # decode_on_device면 salience를 numpy로 옮기지 않고 device에서 바로 decode한다.
+        self.decode_on_device = decode_on_device
+        self.cents_mapping_tensor = torch.from_numpy(self.cents_mapping).float().to(
+            device
+        )
 
     def mel2hidden(self, mel):
         with torch.no_grad():
@@ -363,7 +389,21 @@ class RMVPE:
         # f0 = np.array([10 * (2 ** (cent_pred / 1200)) if cent_pred else 0 for cent_pred in cents_pred])
         return f0
 
-    def infer_from_audio(self, audio, thred=0.03):
+    def decode_tensor(self, hidden, thred=0.03):
+        cents_pred = self.to_local_average_cents_tensor(hidden, thred=thred)
+        f0 = 10 * (2 ** (cents_pred / 1200))
+        f0[f0 == 10] = 0
+        return f0.cpu().numpy()
+
+    def infer_from_audio(self, audio, thred=0.03, max_frames=None):
+        n_frames = audio.shape[0] // self.mel_extractor.hop_length + 1
+        if max_frames and n_frames > max_frames:
+            # 긴 트랙은 U-Net을 창 단위로 나눠 메모리 사용량을 고정한다.
+            hidden = self.audio2hidden_windowed(audio, max_frames)
+            if self.decode_on_device:
+                return self.decode_tensor(hidden, thred=thred)
+            return self.decode(hidden.cpu().numpy(), thred=thred)
+
         audio = torch.from_numpy(audio).float().to(self.device).unsqueeze(0)
         # torch.cuda.synchronize()
         # t0=ttime()
@@ -373,6 +413,8 @@ class RMVPE:
         hidden = self.mel2hidden(mel)
         # torch.cuda.synchronize()
         # t2=ttime()
+        if self.decode_on_device:
+            return self.decode_tensor(hidden.squeeze(0).float(), thred=thred)
         hidden = hidden.squeeze(0).cpu().numpy()
         if self.is_half == True:
             hidden = hidden.astype("float32")
@@ -382,28 +424,109 @@ class RMVPE:
         # print("hmvpe:%s\t%s\t%s\t%s"%(t1-t0,t2-t1,t3-t2,t3-t0))
         return f0
 
+    def mel2features(self, mel):
+        """
+        unet+cnn까지만 계산한 프레임별 특징 [1, padded_frames, 384]. fc(BiGRU)는 적용하지 않는다.
+        mel2hidden과 같이 32프레임 배수로 reflect 패딩한 길이 그대로 반환한다.
+        """
+        with torch.no_grad():
+            n_frames = mel.shape[-1]
+            mel = F.pad(
+                mel, (0, 32 * ((n_frames - 1) // 32 + 1) - n_frames), mode="reflect"
+            )
+            mel = mel.transpose(-1, -2).unsqueeze(1)
+            return self.model.cnn(self.model.unet(mel)).transpose(1, 2).flatten(-2)
+
+    def audio2hidden_windowed(self, audio, max_frames):
+        """
+        unet+cnn만 창 단위로 계산하고 fc(BiGRU)는 전체 시퀀스에 한 번 적용해 salience를 구합니다.
+
+        창 시작은 32프레임(U-Net pooling 단위)에 맞추고 양쪽에 receptive field 이상의
+        문맥을 붙인 뒤 가운데만 잘라 쓰므로, 특징은 한 번에 계산한 것과 프레임 단위로 같다.
+        U-Net 메모리는 창 크기로 고정되고, 전체 길이로 남는 것은 [n_frames, 384] 특징과 BiGRU뿐이다.
+        창 크기는 문맥 양쪽 + 32프레임보다 작아질 수 없다.
+        반환값: device 위의 float32 tensor [n_frames, 360]
+        """
+        hop = self.mel_extractor.hop_length
+        n_fft = self.mel_extractor.n_fft
+        context = unet_context_frames(self.model)
+        step = max(32, (max_frames - 2 * context) // 32 * 32)
+
+        n_frames = audio.shape[0] // hop + 1
+        # stft(center=True)와 같은 프레임을 얻도록 전체 트랙을 한 번만 reflect 패딩
+        audio = torch.from_numpy(audio).float().view(1, 1, -1)
+        audio = F.pad(audio, (n_fft // 2, n_fft // 2), mode="reflect").view(1, -1)
+
+        features = []
+        for start in range(0, n_frames, step):
+            end = min(start + step, n_frames)
+            win_start = max(start - context, 0)
+            win_end = min(end + context, n_frames)
+            chunk = audio[:, win_start * hop : (win_end - 1) * hop + n_fft].to(self.device)
+            mel = self.mel_extractor(chunk, center=False)
+            x = self.mel2features(mel)
+            # 마지막 창은 패딩 프레임까지 붙인다. 한 번에 계산할 때도 BiGRU가 패딩 구간을 본다.
+            crop_end = end - win_start if end < n_frames else None
+            features.append(x[:, start - win_start : crop_end])
+            del chunk, mel, x
+        features = torch.cat(features, dim=1)
+        with torch.no_grad():
+            hidden = self.model.fc(features)[:, :n_frames]
+        return hidden.squeeze(0).float()
+
     def to_local_average_cents(self, salience, thred=0.05):
-        # t0 = ttime()
         center = np.argmax(salience, axis=1)  # 帧长#index
         salience = np.pad(salience, ((0, 0), (4, 4)))  # 帧长,368
-        # t1 = ttime()
-        center += 4
-        todo_salience = []
-        todo_cents_mapping = []
-        starts = center - 4
-        ends = center + 5
-        for idx in range(salience.shape[0]):
-            todo_salience.append(salience[:, starts[idx] : ends[idx]][idx])
-            todo_cents_mapping.append(self.cents_mapping[starts[idx] : ends[idx]])
-        # t2 = ttime()
-        todo_salience = np.array(todo_salience)  # 帧长，9
-        todo_cents_mapping = np.array(todo_cents_mapping)  # 帧长，9
+        # 패딩 좌표에서 [center, center + 9) 구간을 프레임별로 한 번에 gather
+        idx = center[:, None] + np.arange(9)  # 帧长，9
+        todo_salience = np.take_along_axis(salience, idx, axis=1)  # 帧长，9
+        todo_cents_mapping = self.cents_mapping[idx]  # 帧长，9
         product_sum = np.sum(todo_salience * todo_cents_mapping, 1)
         weight_sum = np.sum(todo_salience, 1)  # 帧长
         devided = product_sum / weight_sum  # 帧长
-        # t3 = ttime()
         maxx = np.max(salience, axis=1)  # 帧长
         devided[maxx <= thred] = 0
-        # t4 = ttime()
-        # print("decode:%s\t%s\t%s\t%s" % (t1 - t0, t2 - t1, t3 - t2, t4 - t3))
         return devided
+
+    def to_local_average_cents_tensor(self, salience, thred=0.05):
+        # to_local_average_cents와 같은 계산을 torch tensor(device) 위에서 수행
+        center = torch.argmax(salience, dim=1)  # 帧长
+        salience = F.pad(salience, (4, 4))  # 帧长,368
+        idx = center.unsqueeze(1) + torch.arange(9, device=salience.device)
+        todo_salience = torch.gather(salience, 1, idx)  # 帧长，9
+        todo_cents_mapping = self.cents_mapping_tensor.to(salience.device)[idx]  # 帧长，9
+        product_sum = torch.sum(todo_salience * todo_cents_mapping, 1)
+        weight_sum = torch.sum(todo_salience, 1)  # 帧长
+        devided = product_sum / weight_sum  # 帧长
+        maxx = torch.max(salience, dim=1).values  # 帧长
+        devided[maxx <= thred] = 0
+        return devided
+
+
+def get_rmvpe(model_path, is_half, device, decode_on_device=False):
+    """
+    프로세스 전역으로 공유하는 RMVPE를 가져옵니다.
+    VC 인스턴스마다 rmvpe.pt를 다시 읽지 않도록 model registry에 상주시킵니다.
+    """
+    from model_registry import registry
+
+    key = (
+        "rmvpe",
+        os.path.abspath(model_path),
+        str(device),
+        bool(is_half),
+        bool(decode_on_device),
+    )
+    return registry.get(
+        key,
+        lambda: RMVPE(
+            model_path, is_half, device=device, decode_on_device=decode_on_device
+        ),
+    )
+
+
+def rmvpe_load_count():
+    """프로세스 시작 이후 rmvpe.pt를 로드한 횟수."""
+    from model_registry import registry
+
+    return registry.load_count("rmvpe")
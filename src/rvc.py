@@ -1,7 +1,9 @@
+from functools import lru_cache
 from multiprocessing import cpu_count
 from pathlib import Path
 
 import logging
+import numpy as np
 import torch
 import os
 from fairseq import checkpoint_utils
@@ -13,8 +15,11 @@ from infer_pack.models import (
     SynthesizerTrnMs768NSFsid,
     SynthesizerTrnMs768NSFsid_nono,
 )
+from model_registry import registry
+from instrumentation import collector
 from my_utils import load_audio
-from vc_infer_pipeline import VC
+from rmvpe import get_rmvpe
+from vc_infer_pipeline import VC, rmvpe_model_path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +31,14 @@ class Config:
         self.n_cpu = 0
         self.gpu_name = None
         self.gpu_mem = None
+        # pitch sweep을 net_g 한 번에 합성할 때 batch로 묶을 최대 pitch 수 (0이면 제한 없음)
+        self.pitch_batch_size = int(os.getenv("RVC_PITCH_BATCH_SIZE", "2")) or None
+        # RMVPE salience decode를 GPU/CPU tensor 위에서 바로 수행 (numpy 왕복 생략)
+        self.rmvpe_decode_on_device = os.getenv("RMVPE_DECODE_ON_DEVICE", "0") == "1"
+        # RMVPE를 창 단위로 나눠 추론할 최대 프레임 수 (10ms/프레임, 0이면 한 번에)
+        self.rmvpe_max_frames = int(os.getenv("RMVPE_MAX_FRAMES", "0")) or None
+        # 긴 보컬의 segment를 Hubert/net_g에 한 번에 넣을 최대 개수 (0이면 순차 처리)
+        self.segment_batch_size = int(os.getenv("RVC_SEGMENT_BATCH_SIZE", "0")) or None
         self.x_pad, self.x_query, self.x_center, self.x_max = self.device_config()
 
     def device_config(self) -> tuple:
@@ -105,6 +118,12 @@ class Config:
         return x_pad, x_query, x_center, x_max
 
 
+@lru_cache
+def get_config(device, is_half):
+    # Config는 GPU 조회와 설정 파일 재작성을 하므로 프로세스당 한 번만 만든다.
+    return Config(device, is_half)
+
+
 def load_hubert(device, is_half, model_path):
     models, saved_cfg, task = checkpoint_utils.load_model_ensemble_and_task(
         [model_path],
@@ -158,6 +177,52 @@ def get_vc(device, is_half, config, model_path):
     return cpt, version, net_g, tgt_sr, vc
 
 
+def _registry_key(kind, device, is_half, model_path):
+    # 같은 경로에 모델이 새로 받아지면 mtime이 바뀌므로 다시 로드된다.
+    return (
+        kind,
+        os.path.abspath(model_path),
+        os.path.getmtime(model_path),
+        str(device),
+        bool(is_half),
+    )
+
+
+def get_cached_hubert(device, is_half, model_path):
+    """프로세스 전역 registry에서 Hubert 모델을 가져오고, 없으면 로드합니다."""
+    return registry.get(
+        _registry_key("hubert", device, is_half, model_path),
+        lambda: load_hubert(device, is_half, model_path),
+    )
+
+
+def get_cached_vc(device, is_half, config, model_path):
+    """get_vc 결과를 registry에 상주시킵니다. 추론에 필요 없는 원본 weight는 버립니다."""
+
+    def loader():
+        cpt, version, net_g, tgt_sr, vc = get_vc(device, is_half, config, model_path)
+        cpt.pop("weight", None)
+        return cpt, version, net_g, tgt_sr, vc
+
+    return registry.get(_registry_key("vc", device, is_half, model_path), loader)
+
+
+def warmup_models(device, is_half, hubert_path):
+    """
+    워커 시작 시 Hubert와 공유 RMVPE를 미리 올리고 RMVPE를 한 번 실행해 둡니다.
+    첫 요청이 모델 로드와 CUDA 커널 초기화 비용을 내지 않게 합니다.
+    """
+    config = get_config(device, is_half)
+    get_cached_hubert(config.device, config.is_half, hubert_path)
+    model_rmvpe = get_rmvpe(
+        rmvpe_model_path,
+        is_half=config.is_half,
+        device=config.device,
+        decode_on_device=config.rmvpe_decode_on_device,
+    )
+    model_rmvpe.infer_from_audio(np.zeros(16000, dtype=np.float32), thred=0.03)
+
+
 def rvc_infer(
     index_path,
     index_rate,
@@ -176,28 +241,60 @@ def rvc_infer(
     vc,
     hubert_model,
 ):
+    rvc_infer_multi(
+        index_path,
+        index_rate,
+        input_path,
+        {pitch_change: output_path},
+        f0_method,
+        cpt,
+        version,
+        net_g,
+        filter_radius,
+        tgt_sr,
+        rms_mix_rate,
+        protect,
+        crepe_hop_length,
+        vc,
+        hubert_model,
+    )
+
+
+def rvc_infer_multi(
+    index_path,
+    index_rate,
+    input_path,
+    output_paths_by_pitch,
+    f0_method,
+    cpt,
+    version,
+    net_g,
+    filter_radius,
+    tgt_sr,
+    rms_mix_rate,
+    protect,
+    crepe_hop_length,
+    vc,
+    hubert_model,
+):
+    """
+    하나의 입력을 여러 pitch로 변환합니다.
+    output_paths_by_pitch: {pitch_change: output_path}
+    Hubert/f0/faiss 단계는 한 번만 계산하고 pitch별로 합성만 반복합니다.
+    """
     logger = logging.getLogger(__name__)
 
     try:
         logger.debug(f"Starting RVC inference with params:")
         logger.debug(f"Input path: {input_path}")
-        logger.debug(f"Output path: {output_path}")
-        logger.debug(f"Pitch change: {pitch_change}")
+        logger.debug(f"Output paths: {output_paths_by_pitch}")
         logger.debug(f"F0 method: {f0_method}")
 
-        # 입력 파일 체크
-        logger.debug("Checking input file")
-        if not os.path.exists(input_path):
-            logger.error(f"Input file not found: {input_path}")
-            raise FileNotFoundError(f"Input file not found: {input_path}")
-        logger.debug(f"File size: {os.path.getsize(input_path)}")
-        logger.debug(f"File permissions: {oct(os.stat(input_path).st_mode)[-3:]}")
-
-        # 오디오 로드
-        logger.debug("Attempting to load audio file")
+        # 오디오 로드 (파일이 없으면 load_audio가 FileNotFoundError를 낸다)
         try:
-            audio = load_audio(input_path, 16000)
-            logger.debug("Audio loaded successfully")
+            with collector.stage("load_audio", path=input_path):
+                audio = load_audio(input_path, 16000)
+            collector.audio("rvc_infer.input", input_path, 16000, audio.shape[0])
         except Exception as e:
             logger.error(f"Failed to load audio: {str(e)}")
             if hasattr(e, "stderr"):
@@ -209,41 +306,57 @@ def rvc_infer(
         logger.debug(f"Using f0: {if_f0}")
 
         # VC 파이프라인 실행
-        logger.debug("Starting VC pipeline")
+        pitch_changes = list(output_paths_by_pitch.keys())
+        logger.debug(f"Starting VC pipeline for pitches: {pitch_changes}")
         try:
-            audio_opt = vc.pipeline(
-                hubert_model,
-                net_g,
-                0,
-                audio,
-                input_path,
-                times,
-                pitch_change,
-                f0_method,
-                index_path,
-                index_rate,
-                if_f0,
-                filter_radius,
-                tgt_sr,
-                0,
-                rms_mix_rate,
-                version,
-                protect,
-                crepe_hop_length,
-            )
+            with collector.stage("vc.pipeline", pitches=pitch_changes):
+                audio_opts = vc.pipeline_multi(
+                    hubert_model,
+                    net_g,
+                    0,
+                    audio,
+                    input_path,
+                    times,
+                    pitch_changes,
+                    f0_method,
+                    index_path,
+                    index_rate,
+                    if_f0,
+                    filter_radius,
+                    tgt_sr,
+                    0,
+                    rms_mix_rate,
+                    version,
+                    protect,
+                    crepe_hop_length,
+                )
             logger.debug("VC pipeline completed successfully")
         except Exception as e:
             logger.error(f"Error in VC pipeline: {str(e)}")
             raise
 
+        # times: [hubert+faiss, f0, net_g 합성] 누적 시간
+        for name, seconds in zip(("vc.features", "vc.f0", "vc.synthesis"), times):
+            collector.timing(name, seconds, path=input_path)
+
         # 결과 저장
-        logger.debug(f"Saving output to: {output_path}")
-        try:
-            wavfile.write(output_path, tgt_sr, audio_opt)
-            logger.debug("Output saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving output file: {str(e)}")
-            raise
+        for pitch_change, audio_opt in zip(pitch_changes, audio_opts):
+            output_path = output_paths_by_pitch[pitch_change]
+            collector.audio(
+                "rvc_infer.output",
+                output_path,
+                tgt_sr,
+                audio_opt.shape[0],
+                pitch=pitch_change,
+            )
+            logger.debug(f"Saving output to: {output_path}")
+            try:
+                with collector.stage("write_output", pitch=pitch_change):
+                    wavfile.write(output_path, tgt_sr, audio_opt)
+                logger.debug("Output saved successfully")
+            except Exception as e:
+                logger.error(f"Error saving output file: {str(e)}")
+                raise
 
     except Exception as e:
         logger.error(f"Error in rvc_infer: {str(e)}")
@@ -0,0 +1,189 @@
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+S3_REGION = os.getenv("S3_REGION", "ap-northeast-2")
+# moto/localstack 같은 로컬 S3로 돌릴 때 지정 (예: http://localhost:5000)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "8"))
+S3_UPLOAD_MAX_ATTEMPTS = int(os.getenv("S3_UPLOAD_MAX_ATTEMPTS", "4"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8"))
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+
+# 결과 폴더에서 실제로 쓰는 파일 (audioPairList의 mrUrl/vocalUrl)
+DEFAULT_INCLUDE_SUFFIXES = ("_mr.mp3", "_reverb.mp3")
+
+
+def make_s3_client(region_name=S3_REGION, endpoint_url=S3_ENDPOINT_URL, **kwargs):
+    """업로드 스레드 수만큼 커넥션 풀을 잡은 S3 클라이언트를 만듭니다."""
+    pool = S3_UPLOAD_WORKERS * max(1, S3_MULTIPART_CONCURRENCY)
+    return boto3.client(
+        "s3",
+        region_name=region_name,
+        endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=max(10, pool)),
+        **kwargs,
+    )
+
+
+def make_transfer_config():
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+        max_concurrency=S3_MULTIPART_CONCURRENCY,
+        use_threads=S3_MULTIPART_CONCURRENCY > 1,
+    )
+
+
+def collect_files(input_dir, include_suffixes=DEFAULT_INCLUDE_SUFFIXES):
+    """input_dir 아래에서 업로드할 파일 (절대 경로, 상대 경로) 목록을 반환합니다."""
+    files = []
+    for root, _, names in os.walk(input_dir):
+        for file_name in sorted(names):
+            if include_suffixes is not None and not file_name.endswith(
+                tuple(include_suffixes)
+            ):
+                continue
+            file_path = os.path.join(root, file_name)
+            files.append((file_path, os.path.relpath(file_path, input_dir)))
+    return files
+
+
+def s3_key(save_s3_dir, relative_path):
+    # 기존 URL(…amazonaws.com//song-requests/…)과 맞추기 위해 앞의 "/"를 그대로 둔다.
+    return os.path.join(save_s3_dir, relative_path)
+
+
+class S3Uploader:
+    """
+    파일을 스레드 풀에서 동시에 올리는 S3 업로더.
+
+    client를 주입받으므로 moto 등 로컬 S3 클라이언트로 그대로 테스트할 수 있다.
+    실패한 파일은 지수 backoff로 max_attempts번까지 다시 시도한다.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket_name,
+        max_workers=S3_UPLOAD_WORKERS,
+        transfer_config=None,
+        max_attempts=S3_UPLOAD_MAX_ATTEMPTS,
+        backoff_base=0.5,
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self.transfer_config = transfer_config or make_transfer_config()
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+
+    def upload_file(self, file_path, key):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.client.upload_file(
+                    file_path, self.bucket_name, key, Config=self.transfer_config
+                )
+                logger.info(f"Uploaded {file_path} to {key}")
+                return key
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"Failed to upload {file_path} after {attempt} attempts: {e}")
+                    raise
+                delay = self.backoff_base * (2 ** (attempt - 1)) * (1 + random.random())
+                logger.warning(
+                    f"Upload of {file_path} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+
+    def upload_files(self, items):
+        """
+        [(file_path, key), ...]를 동시에 올리고 올린 key 목록을 반환합니다.
+        하나라도 실패하면 나머지가 끝난 뒤 첫 번째 예외를 다시 던집니다.
+        """
+        keys, errors = [], []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.upload_file, file_path, key): file_path
+                for file_path, key in items
+            }
+            for future in as_completed(futures):
+                try:
+                    keys.append(future.result())
+                except Exception as e:
+                    errors.append((futures[future], e))
+        if errors:
+            file_path, e = errors[0]
+            raise RuntimeError(
+                f"{len(errors)} of {len(items)} uploads failed (first: {file_path}: {e})"
+            ) from e
+        return keys
+
+    def upload_folder(
+        self, input_dir, save_s3_dir, include_suffixes=DEFAULT_INCLUDE_SUFFIXES
+    ):
+        """input_dir에서 include_suffixes로 끝나는 파일만 save_s3_dir 아래로 올립니다."""
+        files = collect_files(input_dir, include_suffixes)
+        logger.info(f"Uploading {len(files)} files from {input_dir} to {save_s3_dir}")
+        return self.upload_files(
+            [(file_path, s3_key(save_s3_dir, rel)) for file_path, rel in files]
+        )
+
+
+class BackgroundUploader:
+    """
+    추론이 진행되는 동안 완성된 파일을 바로 올리는 백그라운드 업로더.
+
+    submit()으로 넘긴 파일은 input_dir 기준 상대 경로로 save_s3_dir 아래에 올라가고,
+    wait()는 남은 업로드를 기다린 뒤 올린 key 목록을 반환한다. (실패가 있으면 예외)
+    """
+
+    def __init__(self, uploader, input_dir, save_s3_dir):
+        self.uploader = uploader
+        self.input_dir = input_dir
+        self.save_s3_dir = save_s3_dir
+        self._executor = ThreadPoolExecutor(
+            max_workers=uploader.max_workers, thread_name_prefix="s3-upload"
+        )
+        self._futures = {}
+
+    def submit(self, *file_paths):
+        for file_path in file_paths:
+            if file_path in self._futures:
+                continue
+            key = s3_key(self.save_s3_dir, os.path.relpath(file_path, self.input_dir))
+            self._futures[file_path] = self._executor.submit(
+                self.uploader.upload_file, file_path, key
+            )
+
+    def wait(self):
+        keys, errors = [], []
+        for file_path, future in self._futures.items():
+            try:
+                keys.append(future.result())
+            except Exception as e:
+                errors.append((file_path, e))
+        self._executor.shutdown(wait=True)
+        if errors:
+            file_path, e = errors[0]
+            raise RuntimeError(
+                f"{len(errors)} of {len(self._futures)} uploads failed (first: {file_path}: {e})"
+            ) from e
+        return keys
+
+    def cancel(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=True)
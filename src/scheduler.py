@@ -0,0 +1,129 @@
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 단계별 worker 수와 단계 사이 대기열 크기
+SCHEDULER_DOWNLOAD_WORKERS = int(os.getenv("SCHEDULER_DOWNLOAD_WORKERS", "2"))
+# 모델을 가진 GPU 추론은 한 스레드만 돌린다.
+SCHEDULER_INFERENCE_WORKERS = 1
+SCHEDULER_POSTPROCESS_WORKERS = int(os.getenv("SCHEDULER_POSTPROCESS_WORKERS", "2"))
+SCHEDULER_UPLOAD_WORKERS = int(os.getenv("SCHEDULER_UPLOAD_WORKERS", "2"))
+SCHEDULER_QUEUE_SIZE = int(os.getenv("SCHEDULER_QUEUE_SIZE", "2"))
+
+_STOP = object()
+
+
+class Stage:
+    """이름, 실행 함수(job -> None), worker 수. 입력 대기열은 스케줄러가 만든다."""
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+class StagedScheduler:
+    """
+    단계별 스레드 풀을 크기가 정해진 대기열로 이은 파이프라인 스케줄러.
+
+    job은 첫 단계부터 순서대로 각 단계의 fn(job)을 거친다. 뒤 단계 대기열이 차면
+    앞 단계가 기다리므로(backpressure) 한 요청이 GPU에 있는 동안 다음 요청은 다운로드,
+    이전 요청은 업로드를 진행하고, 처리량은 가장 느린 단계(추론)에 맞춰진다.
+
+    on_done(job): 마지막 단계까지 끝난 job
+    on_error(job, stage_name, exc): 단계에서 예외가 난 job (이후 단계로 넘어가지 않는다)
+    """
+
+    def __init__(self, stages, queue_size=SCHEDULER_QUEUE_SIZE, on_done=None, on_error=None):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.on_done = on_done
+        self.on_error = on_error
+        self._threads = []
+        self._pending = 0
+        self._pending_lock = threading.Condition()
+
+    def start(self):
+        for i, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_stage,
+                    args=(i,),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append((i, thread))
+        return self
+
+    def submit(self, job, timeout=None):
+        """첫 단계 대기열에 job을 넣습니다. 대기열이 차 있으면 자리가 날 때까지 기다린다."""
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            self.queues[0].put(job, timeout=timeout)
+        except queue.Full:
+            self._finish()
+            raise
+
+    def has_capacity(self):
+        return not self.queues[0].full()
+
+    @property
+    def pending(self):
+        with self._pending_lock:
+            return self._pending
+
+    def _finish(self):
+        with self._pending_lock:
+            self._pending -= 1
+            self._pending_lock.notify_all()
+
+    def _run_stage(self, i):
+        stage = self.stages[i]
+        in_queue = self.queues[i]
+        out_queue = self.queues[i + 1] if i + 1 < len(self.queues) else None
+        while True:
+            job = in_queue.get()
+            if job is _STOP:
+                break
+            try:
+                stage.fn(job)
+            except Exception as e:
+                logger.error(f"Stage {stage.name} failed: {e}")
+                self._callback(self.on_error, job, stage.name, e)
+                self._finish()
+                continue
+            if out_queue is not None:
+                out_queue.put(job)
+            else:
+                self._callback(self.on_done, job)
+                self._finish()
+
+    def _callback(self, fn, *args):
+        if fn is None:
+            return
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Scheduler callback failed: {e}")
+
+    def join(self, timeout=None):
+        """제출된 job이 모두 끝날 때까지 기다립니다."""
+        with self._pending_lock:
+            return self._pending_lock.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self, wait=True):
+        """남은 job을 처리한 뒤 worker를 멈춥니다."""
+        if wait:
+            self.join()
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.queues[i].put(_STOP)
+            if wait:
+                for j, thread in self._threads:
+                    if j == i:
+                        thread.join()
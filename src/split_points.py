@@ -0,0 +1,122 @@
+import argparse
+import json
+from time import time as ttime
+
+import numpy as np
+
+
+def _cumsum(audio_pad):
+    csum = np.empty(audio_pad.shape[0] + 1, dtype=np.float64)
+    csum[0] = 0
+    np.cumsum(audio_pad, dtype=np.float64, out=csum[1:])
+    return csum
+
+
+def moving_sum(audio_pad, window, csum=None):
+    """
+    audio_pad[i : i + window] 구간 합을 len(audio_pad) - window개 위치에 대해 구합니다.
+    cumsum 한 번으로 계산하므로 window 크기와 무관하게 O(n)입니다.
+    """
+    if csum is None:
+        csum = _cumsum(audio_pad)
+    n = audio_pad.shape[0] - window
+    return csum[window : window + n] - csum[:n]
+
+
+def find_split_points(audio, window, t_center, t_query, t_max):
+    """
+    긴 오디오를 나눌 조용한 지점(sample index) 목록을 반환합니다.
+
+    t_center 간격의 기준점마다 앞뒤 t_query 구간에서 window 길이 이동합의 절댓값이
+    가장 작은 위치를 고릅니다. audio_pad 길이가 t_max 이하면 나누지 않습니다.
+
+    이동합을 cumsum 차이로 구하므로 분해능은 eps * max|cumsum| 정도이고, 그보다 작은 합은
+    0으로 맞춰 동률이면 첫 위치를 고릅니다. 완전한 무음은 기존 루프와 같은 위치가 나오지만,
+    filtfilt 꼬리처럼 분해능보다 작은(0은 아닌) 값이 이어지는 구간에서는 기존 루프가 그 뒤의
+    정확한 0을 고르는 반면 여기서는 그 구간의 첫 위치를 고를 수 있습니다. 둘 다 사실상 무음입니다.
+    """
+    audio_pad = np.pad(audio, (window // 2, window // 2), mode="reflect")
+    if audio_pad.shape[0] <= t_max:
+        return []
+    csum = _cumsum(audio_pad)
+    audio_sum = np.abs(moving_sum(audio_pad, window, csum))
+    resolution = 4 * np.finfo(np.float64).eps * float(np.abs(csum).max())
+    audio_sum[audio_sum <= resolution] = 0
+    opt_ts = []
+    for t in range(t_center, audio.shape[0], t_center):
+        start = t - t_query
+        opt_ts.append(start + int(np.argmin(audio_sum[start : t + t_query])))
+    return opt_ts
+
+
+def _find_split_points_legacy(audio, window, t_center, t_query, t_max):
+    # 기존 VC.pipeline 구현 (벤치마크 비교용)
+    audio_pad = np.pad(audio, (window // 2, window // 2), mode="reflect")
+    opt_ts = []
+    if audio_pad.shape[0] > t_max:
+        audio_sum = np.zeros_like(audio)
+        for i in range(window):
+            audio_sum += audio_pad[i : i - window]
+        for t in range(t_center, audio.shape[0], t_center):
+            opt_ts.append(
+                t
+                - t_query
+                + np.where(
+                    np.abs(audio_sum[t - t_query : t + t_query])
+                    == np.abs(audio_sum[t - t_query : t + t_query]).min()
+                )[0][0]
+            )
+    return opt_ts
+
+
+def benchmark(seconds=300, sr=16000, repeat=5, seed=0):
+    """
+    합성 신호로 기존 루프와 cumsum 구현의 속도와 결과 일치 여부를 비교합니다.
+    신호에는 완전한 무음 구간이 있어 0 동률 처리도 함께 확인합니다. 분해능보다 작은 값이
+    이어지는 신호에서는 위치가 다를 수 있습니다. (find_split_points 참고)
+    """
+    # rvc.Config.device_config 기본값 (x_query=10, x_center=60, x_max=65)
+    window = 160
+    t_query, t_center, t_max = sr * 10, sr * 60, sr * 65
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * sr) / sr
+    # 문장 단위로 크기가 바뀌는 노이즈 (중간중간 조용한 구간이 생긴다)
+    envelope = np.abs(np.sin(2 * np.pi * t / 7.0)) ** 4
+    audio = rng.normal(0, 0.3, t.shape[0]) * envelope
+    # 디지털 무음 (분리된 보컬의 쉬는 구간처럼 정확히 0인 샘플)
+    for start in range(50, seconds, 60):
+        audio[start * sr : (start + 20) * sr] = 0
+
+    def run(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = ttime()
+            result = fn(audio, window, t_center, t_query, t_max)
+            best = min(best, ttime() - t0)
+        return best, [int(x) for x in result]
+
+    legacy_s, legacy_ts = run(_find_split_points_legacy)
+    cumsum_s, cumsum_ts = run(find_split_points)
+    return {
+        "seconds": seconds,
+        "sr": sr,
+        "legacy_ms": round(legacy_s * 1000, 2),
+        "cumsum_ms": round(cumsum_s * 1000, 2),
+        "speedup": round(legacy_s / cumsum_s, 1),
+        "split_points": cumsum_ts,
+        "max_diff_samples": max(
+            (abs(a - b) for a, b in zip(legacy_ts, cumsum_ts)), default=0
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cumsum quiet-point search against the legacy per-offset loop."
+    )
+    parser.add_argument("--seconds", type=int, default=300)
+    parser.add_argument("--sr", type=int, default=16000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.seconds, args.sr, args.repeat), indent=2))
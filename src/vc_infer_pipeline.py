@@ -1,7 +1,6 @@
 from functools import lru_cache
 from time import time as ttime
 
-import faiss
 import librosa
 import numpy as np
 import os
@@ -19,6 +18,12 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 now_dir = os.path.join(BASE_DIR, "src")
 sys.path.append(now_dir)
 
+from feature_index import INDEX_K, blend_neighbors, load_feature_index
+from instrumentation import collector
+from split_points import find_split_points
+
+rmvpe_model_path = os.path.join(BASE_DIR, "rvc_models", "rmvpe.pt")
+
 bh, ah = signal.butter(N=5, Wn=48, btype="high", fs=16000)
 
 input_audio_path2wav = {}
@@ -38,25 +43,51 @@ def cache_harvest_f0(input_audio_path, fs, f0max, f0min, frame_period):
     return f0
 
 
-def change_rms(data1, sr1, data2, sr2, rate):  # 1是输入音频，2是输出音频,rate是2的占比
-    # print(data1.max(),data2.max())
-    rms1 = librosa.feature.rms(
-        y=data1, frame_length=sr1 // 2 * 2, hop_length=sr1 // 2
-    )  # 每半秒一个点
-    rms2 = librosa.feature.rms(y=data2, frame_length=sr2 // 2 * 2, hop_length=sr2 // 2)
-    rms1 = torch.from_numpy(rms1)
-    rms1 = F.interpolate(
-        rms1.unsqueeze(0), size=data2.shape[0], mode="linear"
-    ).squeeze()
-    rms2 = torch.from_numpy(rms2)
-    rms2 = F.interpolate(
-        rms2.unsqueeze(0), size=data2.shape[0], mode="linear"
-    ).squeeze()
-    rms2 = torch.max(rms2, torch.zeros_like(rms2) + 1e-6)
-    data2 *= (
-        torch.pow(rms1, torch.tensor(1 - rate))
-        * torch.pow(rms2, torch.tensor(rate - 1))
-    ).numpy()
+def frame_rms(y, frame_length, hop_length):
+    """
+    librosa.feature.rms(center=True, pad_mode="constant")와 같은 프레임 RMS를
+    제곱 누적합으로 구합니다. 프레임마다 배열을 만들지 않아 긴 트랙에서도 O(n)입니다.
+    """
+    pad = frame_length // 2
+    n_frames = 1 + (y.shape[0] + 2 * pad - frame_length) // hop_length
+    csum = np.zeros(y.shape[0] + 2 * pad + 1, dtype=np.float64)
+    np.cumsum(np.square(y, dtype=np.float64), out=csum[pad + 1 : pad + 1 + y.shape[0]])
+    csum[pad + 1 + y.shape[0] :] = csum[pad + y.shape[0]]  # 뒤쪽 zero padding
+    starts = np.arange(n_frames) * hop_length
+    energy = (csum[starts + frame_length] - csum[starts]) / frame_length
+    return np.sqrt(np.maximum(energy, 0))
+
+
+def interp_positions(n_in, start, stop, n_out):
+    # F.interpolate(mode="linear", align_corners=False)가 출력 [start, stop)에 쓰는 입력 좌표
+    scale = n_in / n_out
+    return (np.arange(start, stop, dtype=np.float64) + 0.5) * scale - 0.5
+
+
+def change_rms(data1, sr1, data2, sr2, rate, block_size=1 << 20):
+    """
+    출력(data2)의 음량 곡선을 입력(data1) 쪽으로 rate 비율만큼 맞춥니다. (1이면 그대로)
+    gain = rms1 ** (1 - rate) * rms2 ** (rate - 1)을 rms2 프레임 단위로 계산해
+    출력 길이로 한 번만 보간하고, data2(float32)에 block 단위로 바로 곱합니다.
+    """
+    rms1 = frame_rms(data1, sr1 // 2 * 2, sr1 // 2)  # 每半秒一个点
+    rms2 = frame_rms(data2, sr2 // 2 * 2, sr2 // 2)
+    # rms1을 rms2 프레임 격자로 옮긴다. (둘 다 출력 길이로 늘리던 것과 같은 좌표계)
+    rms1 = np.interp(
+        interp_positions(rms1.shape[0], 0, rms2.shape[0], rms2.shape[0]),
+        np.arange(rms1.shape[0]),
+        rms1,
+    )
+    rms2 = np.maximum(rms2, 1e-6)
+    gain = np.power(rms1, 1 - rate) * np.power(rms2, rate - 1)
+
+    if data2.dtype != np.float32 or not data2.flags.writeable:
+        data2 = data2.astype(np.float32)
+    frames = np.arange(gain.shape[0])
+    for start in range(0, data2.shape[0], block_size):
+        stop = min(start + block_size, data2.shape[0])
+        pos = interp_positions(gain.shape[0], start, stop, data2.shape[0])
+        data2[start:stop] *= np.interp(pos, frames, gain).astype(np.float32)
     return data2
 
 
@@ -78,6 +109,10 @@ class VC(object):
         self.t_center = self.sr * self.x_center  # 查询切点位置
         self.t_max = self.sr * self.x_max  # 免查询时长阈值
         self.device = config.device
+        self.pitch_batch_size = config.pitch_batch_size  # None이면 모든 pitch를 한 batch로
+        self.rmvpe_decode_on_device = config.rmvpe_decode_on_device
+        self.rmvpe_max_frames = config.rmvpe_max_frames  # None이면 한 번에 추론
+        self.segment_batch_size = config.segment_batch_size  # None이면 segment를 순서대로
 
     # Fork Feature: Get the best torch device to use for f0 algorithms that require a torch device. Will return the type (torch.device)
     def get_optimal_torch_device(self, index: int = 0) -> torch.device:
@@ -259,23 +294,20 @@ class VC(object):
             f0_median_hybrid = np.nanmedian(f0_computation_stack, axis=0)
         return f0_median_hybrid
 
-    def get_f0(
+    def compute_f0(
         self,
         input_audio_path,
         x,
         p_len,
-        f0_up_key,
         f0_method,
         filter_radius,
         crepe_hop_length,
-        inp_f0=None,
     ):
+        # f0_up_key 적용 전의 원본 f0. pitch 변경값과 무관하므로 여러 pitch에서 재사용한다.
         global input_audio_path2wav
         time_step = self.window / self.sr * 1000
         f0_min = 50
         f0_max = 1100
-        f0_mel_min = 1127 * np.log(1 + f0_min / 700)
-        f0_mel_max = 1127 * np.log(1 + f0_max / 700)
         if f0_method == "pm":
             f0 = (
                 parselmouth.Sound(x, self.sr)
@@ -320,15 +352,18 @@ class VC(object):
                 x, f0_min, f0_max, p_len, crepe_hop_length, "tiny"
             )
         elif f0_method == "rmvpe":
-            if hasattr(self, "model_rmvpe") == False:
-                from rmvpe import RMVPE
+            from rmvpe import get_rmvpe
 
-                self.model_rmvpe = RMVPE(
-                    os.path.join(BASE_DIR, "rvc_models", "rmvpe.pt"),
-                    is_half=self.is_half,
-                    device=self.device,
-                )
-            f0 = self.model_rmvpe.infer_from_audio(x, thred=0.03)
+            # 모든 VC 인스턴스가 프로세스 전역 RMVPE 하나를 공유한다.
+            model_rmvpe = get_rmvpe(
+                rmvpe_model_path,
+                is_half=self.is_half,
+                device=self.device,
+                decode_on_device=self.rmvpe_decode_on_device,
+            )
+            f0 = model_rmvpe.infer_from_audio(
+                x, thred=0.03, max_frames=self.rmvpe_max_frames
+            )
 
         elif "hybrid" in f0_method:
             # Perform hybrid median pitch estimation
@@ -345,7 +380,14 @@ class VC(object):
                 time_step,
             )
 
-        f0 *= pow(2, f0_up_key / 12)
+        return f0
+
+    def shift_f0(self, f0, f0_up_key, inp_f0=None):
+        f0_min = 50
+        f0_max = 1100
+        f0_mel_min = 1127 * np.log(1 + f0_min / 700)
+        f0_mel_max = 1127 * np.log(1 + f0_max / 700)
+        f0 = f0 * pow(2, f0_up_key / 12)
         # with open("test.txt","w")as f:f.write("\n".join([str(i)for i in f0.tolist()]))
         tf0 = self.sr // self.window  # 每秒f0点数
         if inp_f0 is not None:
@@ -371,21 +413,35 @@ class VC(object):
 
         return f0_coarse, f0bak  # 1-0
 
-    def vc(
+    def get_f0(
+        self,
+        input_audio_path,
+        x,
+        p_len,
+        f0_up_key,
+        f0_method,
+        filter_radius,
+        crepe_hop_length,
+        inp_f0=None,
+    ):
+        f0 = self.compute_f0(
+            input_audio_path, x, p_len, f0_method, filter_radius, crepe_hop_length
+        )
+        return self.shift_f0(f0, f0_up_key, inp_f0)
+
+    def extract_features(
         self,
         model,
-        net_g,
-        sid,
         audio0,
-        pitch,
-        pitchf,
         times,
         index,
         big_npy,
         index_rate,
         version,
         protect,
-    ):  # ,file_index,file_big_npy
+        if_f0,
+    ):
+        # Hubert 특징 추출 + faiss 검색. f0_up_key와 무관하므로 pitch별로 재사용할 수 있다.
         feats = torch.from_numpy(audio0)
         if self.is_half:
             feats = feats.half()
@@ -406,7 +462,70 @@ class VC(object):
         with torch.no_grad():
             logits = model.extract_features(**inputs)
             feats = model.final_proj(logits[0]) if version == "v1" else logits[0]
-        if protect < 0.5 and pitch != None and pitchf != None:
+        feats, feats0 = self.retrieve_features(
+            feats, index, big_npy, index_rate, protect, if_f0
+        )
+        del padding_mask
+        t1 = ttime()
+        times[0] += t1 - t0
+        return feats, feats0
+
+    def extract_features_batch(
+        self,
+        model,
+        audios,
+        times,
+        index,
+        big_npy,
+        index_rate,
+        version,
+        protect,
+        if_f0,
+    ):
+        """
+        여러 segment의 Hubert 특징을 batch로 추출합니다.
+        conv feature extractor는 시간축 전체로 GroupNorm을 하므로 segment별로 돌리고,
+        transformer encoder만 프레임 padding_mask와 함께 batch로 실행합니다.
+        결과는 segment를 하나씩 extract_features에 넣은 것과 같습니다.
+        """
+        t0 = ttime()
+        with torch.no_grad():
+            features = []
+            for audio0 in audios:
+                source = torch.from_numpy(audio0)
+                source = source.half() if self.is_half else source.float()
+                if source.dim() == 2:  # double channels
+                    source = source.mean(-1)
+                source = source.view(1, -1).to(self.device)
+                features.append(model.forward_features(source)[0].transpose(0, 1))
+            n_frames = [f.shape[0] for f in features]
+            x = torch.nn.utils.rnn.pad_sequence(features, batch_first=True)  # [B, t, c]
+            del features
+            padding_mask = torch.arange(x.shape[1], device=self.device).unsqueeze(
+                0
+            ) >= torch.tensor(n_frames, device=self.device).unsqueeze(1)
+            x = model.layer_norm(x)
+            if model.post_extract_proj is not None:
+                x = model.post_extract_proj(x)
+            x = model.dropout_input(x)
+            output_layer = 9 if version == "v1" else 12
+            x, _ = model.encoder(x, padding_mask=padding_mask, layer=output_layer - 1)
+            feats = model.final_proj(x) if version == "v1" else x
+        extracted = [
+            self.retrieve_features(
+                feats[i : i + 1, :n], index, big_npy, index_rate, protect, if_f0
+            )
+            for i, n in enumerate(n_frames)
+        ]
+        del x, feats, padding_mask
+        t1 = ttime()
+        times[0] += t1 - t0
+        return extracted
+
+    def retrieve_features(self, feats, index, big_npy, index_rate, protect, if_f0):
+        # faiss 검색으로 학습 데이터 특징을 섞고 프레임 수를 2배로 늘린다.
+        feats0 = None
+        if protect < 0.5 and if_f0 == 1:
             feats0 = feats.clone()
         if (
             isinstance(index, type(None)) == False
@@ -420,10 +539,10 @@ class VC(object):
             # _, I = index.search(npy, 1)
             # npy = big_npy[I.squeeze()]
 
-            score, ix = index.search(npy, k=8)
-            weight = np.square(1 / score)
-            weight /= weight.sum(axis=1, keepdims=True)
-            npy = np.sum(big_npy[ix] * np.expand_dims(weight, axis=2), axis=1)
+            score, ix = index.search(npy, k=INDEX_K)
+            blended, found = blend_neighbors(big_npy, score, ix)
+            # 이웃을 못 찾은 프레임은 원래 특징을 그대로 둔다.
+            npy = np.where(found[:, None], blended, npy).astype("float32")
 
             if self.is_half:
                 npy = npy.astype("float16")
@@ -433,19 +552,34 @@ class VC(object):
             )
 
         feats = F.interpolate(feats.permute(0, 2, 1), scale_factor=2).permute(0, 2, 1)
-        if protect < 0.5 and pitch != None and pitchf != None:
+        if feats0 is not None:
             feats0 = F.interpolate(feats0.permute(0, 2, 1), scale_factor=2).permute(
                 0, 2, 1
             )
+        return feats, feats0
+
+    def infer_features(
+        self,
+        net_g,
+        sid,
+        feats,
+        feats0,
+        n_samples,
+        pitch,
+        pitchf,
+        times,
+        protect,
+    ):
+        # extract_features 결과에 pitch를 붙여 net_g 합성만 수행한다.
         t1 = ttime()
-        p_len = audio0.shape[0] // self.window
+        p_len = n_samples // self.window
         if feats.shape[1] < p_len:
             p_len = feats.shape[1]
-            if pitch != None and pitchf != None:
+            if pitch is not None and pitchf is not None:
                 pitch = pitch[:, :p_len]
                 pitchf = pitchf[:, :p_len]
 
-        if protect < 0.5 and pitch != None and pitchf != None:
+        if feats0 is not None and pitch is not None and pitchf is not None:
             pitchff = pitchf.clone()
             pitchff[pitchf > 0] = 1
             pitchff[pitchf < 1] = protect
@@ -454,7 +588,7 @@ class VC(object):
             feats = feats.to(feats0.dtype)
         p_len = torch.tensor([p_len], device=self.device).long()
         with torch.no_grad():
-            if pitch != None and pitchf != None:
+            if pitch is not None and pitchf is not None:
                 audio1 = (
                     (net_g.infer(feats, p_len, pitch, pitchf, sid)[0][0, 0])
                     .data.cpu()
@@ -465,37 +599,65 @@ class VC(object):
                 audio1 = (
                     (net_g.infer(feats, p_len, sid)[0][0, 0]).data.cpu().float().numpy()
                 )
-        del feats, p_len, padding_mask
+        del feats, p_len
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         t2 = ttime()
-        times[0] += t1 - t0
         times[2] += t2 - t1
         return audio1
 
-    def pipeline(
+    def vc(
         self,
         model,
         net_g,
         sid,
+        audio0,
+        pitch,
+        pitchf,
+        times,
+        index,
+        big_npy,
+        index_rate,
+        version,
+        protect,
+    ):  # ,file_index,file_big_npy
+        if_f0 = 1 if pitch is not None and pitchf is not None else 0
+        feats, feats0 = self.extract_features(
+            model, audio0, times, index, big_npy, index_rate, version, protect, if_f0
+        )
+        return self.infer_features(
+            net_g,
+            sid,
+            feats,
+            feats0,
+            audio0.shape[0],
+            pitch,
+            pitchf,
+            times,
+            protect,
+        )
+
+    def prepare(
+        self,
+        model,
         audio,
         input_audio_path,
         times,
-        f0_up_key,
         f0_method,
         file_index,
-        # file_big_npy,
         index_rate,
         if_f0,
         filter_radius,
-        tgt_sr,
-        resample_sr,
-        rms_mix_rate,
         version,
         protect,
         crepe_hop_length,
         f0_file=None,
     ):
+        """
+        pipeline 중 f0_up_key와 무관한 단계(high-pass, 분할 지점 탐색, f0 추정,
+        Hubert 특징 추출, faiss 검색)를 한 번만 계산합니다.
+        결과는 synthesize에 pitch별로 넘겨 재사용합니다.
+        """
         if (
             file_index != ""
             # and file_big_npy != ""
@@ -504,33 +666,17 @@ class VC(object):
             and index_rate != 0
         ):
             try:
-                index = faiss.read_index(file_index)
-                # big_npy = np.load(file_big_npy)
-                big_npy = index.reconstruct_n(0, index.ntotal)
+                # read_index/reconstruct_n 결과는 경로+mtime 기준으로 캐시된다.
+                index, big_npy = load_feature_index(file_index)
             except:
                 traceback.print_exc()
                 index = big_npy = None
         else:
             index = big_npy = None
         audio = signal.filtfilt(bh, ah, audio)
-        audio_pad = np.pad(audio, (self.window // 2, self.window // 2), mode="reflect")
-        opt_ts = []
-        if audio_pad.shape[0] > self.t_max:
-            audio_sum = np.zeros_like(audio)
-            for i in range(self.window):
-                audio_sum += audio_pad[i : i - self.window]
-            for t in range(self.t_center, audio.shape[0], self.t_center):
-                opt_ts.append(
-                    t
-                    - self.t_query
-                    + np.where(
-                        np.abs(audio_sum[t - self.t_query : t + self.t_query])
-                        == np.abs(audio_sum[t - self.t_query : t + self.t_query]).min()
-                    )[0][0]
-                )
-        s = 0
-        audio_opt = []
-        t = None
+        opt_ts = find_split_points(
+            audio, self.window, self.t_center, self.t_query, self.t_max
+        )
         t1 = ttime()
         audio_pad = np.pad(audio, (self.t_pad, self.t_pad), mode="reflect")
         p_len = audio_pad.shape[0] // self.window
@@ -545,101 +691,109 @@ class VC(object):
                 inp_f0 = np.array(inp_f0, dtype="float32")
             except:
                 traceback.print_exc()
-        sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
-        pitch, pitchf = None, None
+        f0 = None
         if if_f0 == 1:
-            pitch, pitchf = self.get_f0(
+            f0 = self.compute_f0(
                 input_audio_path,
                 audio_pad,
                 p_len,
-                f0_up_key,
                 f0_method,
                 filter_radius,
                 crepe_hop_length,
-                inp_f0,
             )
-            pitch = pitch[:p_len]
-            pitchf = pitchf[:p_len]
-            if self.device == "mps":
-                pitchf = pitchf.astype(np.float32)
-            pitch = torch.tensor(pitch, device=self.device).unsqueeze(0).long()
-            pitchf = torch.tensor(pitchf, device=self.device).unsqueeze(0).float()
         t2 = ttime()
         times[1] += t2 - t1
+
+        # (audio 시작, audio 끝, f0 시작, f0 끝)
+        bounds = []
+        s = 0
+        t = None
         for t in opt_ts:
             t = t // self.window * self.window
-            if if_f0 == 1:
-                audio_opt.append(
-                    self.vc(
-                        model,
-                        net_g,
-                        sid,
-                        audio_pad[s : t + self.t_pad2 + self.window],
-                        pitch[:, s // self.window : (t + self.t_pad2) // self.window],
-                        pitchf[:, s // self.window : (t + self.t_pad2) // self.window],
-                        times,
-                        index,
-                        big_npy,
-                        index_rate,
-                        version,
-                        protect,
-                    )[self.t_pad_tgt : -self.t_pad_tgt]
+            bounds.append(
+                (
+                    s,
+                    t + self.t_pad2 + self.window,
+                    s // self.window,
+                    (t + self.t_pad2) // self.window,
                 )
-            else:
-                audio_opt.append(
-                    self.vc(
+            )
+            s = t
+        t = 0 if t is None else t
+        bounds.append((t, None, t // self.window, None))
+
+        audios = [audio_pad[a_start:a_end] for a_start, a_end, _, _ in bounds]
+        if self.segment_batch_size and len(audios) > 1:
+            extracted = []
+            for b in range(0, len(audios), self.segment_batch_size):
+                extracted.extend(
+                    self.extract_features_batch(
                         model,
-                        net_g,
-                        sid,
-                        audio_pad[s : t + self.t_pad2 + self.window],
-                        None,
-                        None,
+                        audios[b : b + self.segment_batch_size],
                         times,
                         index,
                         big_npy,
                         index_rate,
                         version,
                         protect,
-                    )[self.t_pad_tgt : -self.t_pad_tgt]
+                        if_f0,
+                    )
                 )
-            s = t
-        if if_f0 == 1:
-            audio_opt.append(
-                self.vc(
-                    model,
-                    net_g,
-                    sid,
-                    audio_pad[t:],
-                    pitch[:, t // self.window :] if t is not None else pitch,
-                    pitchf[:, t // self.window :] if t is not None else pitchf,
-                    times,
-                    index,
-                    big_npy,
-                    index_rate,
-                    version,
-                    protect,
-                )[self.t_pad_tgt : -self.t_pad_tgt]
-            )
         else:
-            audio_opt.append(
-                self.vc(
+            extracted = [
+                self.extract_features(
                     model,
-                    net_g,
-                    sid,
-                    audio_pad[t:],
-                    None,
-                    None,
+                    audio0,
                     times,
                     index,
                     big_npy,
                     index_rate,
                     version,
                     protect,
-                )[self.t_pad_tgt : -self.t_pad_tgt]
+                    if_f0,
+                )
+                for audio0 in audios
+            ]
+
+        segments = []
+        for audio0, (feats, feats0), (_, _, f_start, f_end) in zip(
+            audios, extracted, bounds
+        ):
+            segments.append(
+                {
+                    "feats": feats,
+                    "feats0": feats0,
+                    "n_samples": audio0.shape[0],
+                    "f0_start": f_start,
+                    "f0_end": f_end,
+                }
             )
+
+        return {
+            "audio": audio,
+            "p_len": p_len,
+            "f0": f0,
+            "inp_f0": inp_f0,
+            "segments": segments,
+        }
+
+    def _pitch_tensors(self, prepared, f0_up_key):
+        p_len = prepared["p_len"]
+        pitch, pitchf = self.shift_f0(prepared["f0"], f0_up_key, prepared["inp_f0"])
+        pitch = pitch[:p_len]
+        pitchf = pitchf[:p_len]
+        if self.device == "mps":
+            pitchf = pitchf.astype(np.float32)
+        pitch = torch.tensor(pitch, device=self.device).unsqueeze(0).long()
+        pitchf = torch.tensor(pitchf, device=self.device).unsqueeze(0).float()
+        return pitch, pitchf
+
+    def _finalize(self, prepared, audio_opt, tgt_sr, resample_sr, rms_mix_rate):
         audio_opt = np.concatenate(audio_opt)
         if rms_mix_rate != 1:
-            audio_opt = change_rms(audio, 16000, audio_opt, tgt_sr, rms_mix_rate)
+            audio_opt = change_rms(
+                prepared["audio"], 16000, audio_opt, tgt_sr, rms_mix_rate
+            )
         if resample_sr >= 16000 and tgt_sr != resample_sr:
             audio_opt = librosa.resample(
                 audio_opt, orig_sr=tgt_sr, target_sr=resample_sr
@@ -648,8 +802,406 @@ class VC(object):
         max_int16 = 32768
         if audio_max > 1:
             max_int16 /= audio_max
-        audio_opt = (audio_opt * max_int16).astype(np.int16)
+        return (audio_opt * max_int16).astype(np.int16)
+
+    def synthesize(
+        self,
+        prepared,
+        net_g,
+        sid,
+        times,
+        f0_up_key,
+        tgt_sr,
+        resample_sr,
+        rms_mix_rate,
+        protect,
+    ):
+        """prepare 결과에 f0_up_key를 적용해 net_g 합성만 수행합니다."""
+        t1 = ttime()
+        sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
+        pitch, pitchf = None, None
+        if prepared["f0"] is not None:
+            pitch, pitchf = self._pitch_tensors(prepared, f0_up_key)
+        t2 = ttime()
+        times[1] += t2 - t1
+        audio_opt = []
+        for seg in prepared["segments"]:
+            seg_pitch, seg_pitchf = None, None
+            if pitch is not None:
+                seg_pitch = pitch[:, seg["f0_start"] : seg["f0_end"]]
+                seg_pitchf = pitchf[:, seg["f0_start"] : seg["f0_end"]]
+            audio_opt.append(
+                self.infer_features(
+                    net_g,
+                    sid,
+                    seg["feats"],
+                    seg["feats0"],
+                    seg["n_samples"],
+                    seg_pitch,
+                    seg_pitchf,
+                    times,
+                    protect,
+                )[self.t_pad_tgt : -self.t_pad_tgt]
+            )
+        audio_opt = self._finalize(
+            prepared, audio_opt, tgt_sr, resample_sr, rms_mix_rate
+        )
         del pitch, pitchf, sid
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         return audio_opt
+
+    def infer_features_batch(
+        self,
+        net_g,
+        sid,
+        feats,
+        feats0,
+        n_samples,
+        pitch,
+        pitchf,
+        times,
+        protect,
+    ):
+        # 같은 feats에 N개의 pitch([N, t])를 붙여 net_g.infer_batch 한 번으로 합성한다.
+        t1 = ttime()
+        p_len = n_samples // self.window
+        if feats.shape[1] < p_len:
+            p_len = feats.shape[1]
+            pitch = pitch[:, :p_len]
+            pitchf = pitchf[:, :p_len]
+
+        if feats0 is not None:
+            pitchff = pitchf.clone()
+            pitchff[pitchf > 0] = 1
+            pitchff[pitchf < 1] = protect
+            pitchff = pitchff.unsqueeze(-1)
+            feats = feats * pitchff + feats0 * (1 - pitchff)  # [N, t, c]
+            feats = feats.to(feats0.dtype)
+        p_len = torch.tensor([p_len], device=self.device).long()
+        with torch.no_grad():
+            audio1 = (
+                (net_g.infer_batch(feats, p_len, pitch, pitchf, sid)[0][:, 0])
+                .data.cpu()
+                .float()
+                .numpy()
+            )
+        del feats, p_len
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        t2 = ttime()
+        times[2] += t2 - t1
+        return list(audio1)
+
+    def synthesize_batch(
+        self,
+        prepared,
+        net_g,
+        sid,
+        times,
+        f0_up_keys,
+        tgt_sr,
+        resample_sr,
+        rms_mix_rate,
+        protect,
+    ):
+        """
+        여러 f0_up_key를 batch 차원으로 쌓아 segment당 net_g 호출 한 번으로 합성합니다.
+        한 번에 쌓는 pitch 수는 pitch_batch_size로 제한하고,
+        CUDA 메모리가 부족하면 그 batch는 pitch 하나씩 다시 합성합니다.
+        """
+        t1 = ttime()
+        sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
+        pitch_tensors = [self._pitch_tensors(prepared, key) for key in f0_up_keys]
+        pitch = torch.cat([p for p, _ in pitch_tensors])
+        pitchf = torch.cat([pf for _, pf in pitch_tensors])
+        del pitch_tensors
+        t2 = ttime()
+        times[1] += t2 - t1
+
+        batch_size = self.pitch_batch_size or len(f0_up_keys)
+        audio_opts = [[] for _ in f0_up_keys]
+        for seg in prepared["segments"]:
+            for b in range(0, len(f0_up_keys), batch_size):
+                outs = self._infer_pitch_batch(
+                    net_g,
+                    sid,
+                    seg,
+                    pitch[b : b + batch_size],
+                    pitchf[b : b + batch_size],
+                    times,
+                    protect,
+                )
+                for i, out in enumerate(outs):
+                    audio_opts[b + i].append(out[self.t_pad_tgt : -self.t_pad_tgt])
+        audio_opts = [
+            self._finalize(prepared, audio_opt, tgt_sr, resample_sr, rms_mix_rate)
+            for audio_opt in audio_opts
+        ]
+        del pitch, pitchf, sid
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return audio_opts
+
+    def _infer_pitch_batch(self, net_g, sid, seg, pitch, pitchf, times, protect):
+        def run(p, pf):
+            return self.infer_features_batch(
+                net_g,
+                sid,
+                seg["feats"],
+                seg["feats0"],
+                seg["n_samples"],
+                p[:, seg["f0_start"] : seg["f0_end"]],
+                pf[:, seg["f0_start"] : seg["f0_end"]],
+                times,
+                protect,
+            )
+
+        try:
+            return run(pitch, pitchf)
+        except torch.cuda.OutOfMemoryError:
+            if pitch.shape[0] == 1:
+                raise
+            print(
+                "CUDA out of memory with %d pitches per batch, retrying one at a time"
+                % pitch.shape[0]
+            )
+            torch.cuda.empty_cache()
+            outs = []
+            for i in range(pitch.shape[0]):
+                outs.extend(run(pitch[i : i + 1], pitchf[i : i + 1]))
+            return outs
+
+    def infer_rows(self, net_g, sid, rows, times, protect):
+        """
+        (feats, feats0, n_samples, pitch, pitchf) 행 여러 개를 길이를 맞춰 padding한 뒤
+        net_g.infer 한 번으로 합성하고, 행별 길이로 잘라 반환합니다.
+        """
+        t1 = ttime()
+        feats_list, pitch_list, pitchf_list, lengths = [], [], [], []
+        for feats, feats0, n_samples, pitch, pitchf in rows:
+            p_len = n_samples // self.window
+            if feats.shape[1] < p_len:
+                p_len = feats.shape[1]
+                if pitch is not None and pitchf is not None:
+                    pitch = pitch[:, :p_len]
+                    pitchf = pitchf[:, :p_len]
+            if feats0 is not None and pitch is not None and pitchf is not None:
+                pitchff = pitchf.clone()
+                pitchff[pitchf > 0] = 1
+                pitchff[pitchf < 1] = protect
+                pitchff = pitchff.unsqueeze(-1)
+                feats = feats * pitchff + feats0 * (1 - pitchff)
+                feats = feats.to(feats0.dtype)
+            feats_list.append(feats[0])
+            lengths.append(p_len)
+            if pitch is not None and pitchf is not None:
+                pitch_list.append(pitch[0])
+                pitchf_list.append(pitchf[0])
+        n_frames = [feats.shape[0] for feats in feats_list]
+        feats = torch.nn.utils.rnn.pad_sequence(feats_list, batch_first=True)
+        p_len = torch.tensor(lengths, device=self.device).long()
+        sid = sid.expand(len(rows))
+        with torch.no_grad():
+            if pitch_list:
+                pitch = torch.nn.utils.rnn.pad_sequence(pitch_list, batch_first=True)
+                pitchf = torch.nn.utils.rnn.pad_sequence(pitchf_list, batch_first=True)
+                audio1 = net_g.infer(feats, p_len, pitch, pitchf, sid)[0][:, 0]
+            else:
+                audio1 = net_g.infer(feats, p_len, sid)[0][:, 0]
+        upp = audio1.shape[-1] // feats.shape[1]
+        audio1 = audio1.data.cpu().float().numpy()
+        del feats, feats_list, pitch_list, pitchf_list, p_len
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        t2 = ttime()
+        times[2] += t2 - t1
+        return [audio1[i, : n * upp] for i, n in enumerate(n_frames)]
+
+    def synthesize_rows(
+        self,
+        prepared,
+        net_g,
+        sid,
+        times,
+        f0_up_keys,
+        tgt_sr,
+        resample_sr,
+        rms_mix_rate,
+        protect,
+    ):
+        """
+        모든 (segment, pitch) 조합을 행으로 펼쳐 segment_batch_size개씩 묶어 합성합니다.
+        f0_up_keys 순서대로 변환 결과 리스트를 반환합니다.
+        """
+        t1 = ttime()
+        sid = torch.tensor(sid, device=self.device).unsqueeze(0).long()
+        pitch_tensors = [(None, None)] * len(f0_up_keys)
+        if prepared["f0"] is not None:
+            pitch_tensors = [self._pitch_tensors(prepared, key) for key in f0_up_keys]
+        t2 = ttime()
+        times[1] += t2 - t1
+
+        rows, owners = [], []
+        for seg in prepared["segments"]:
+            for k, (pitch, pitchf) in enumerate(pitch_tensors):
+                if pitch is not None:
+                    pitch = pitch[:, seg["f0_start"] : seg["f0_end"]]
+                    pitchf = pitchf[:, seg["f0_start"] : seg["f0_end"]]
+                rows.append(
+                    (seg["feats"], seg["feats0"], seg["n_samples"], pitch, pitchf)
+                )
+                owners.append(k)
+
+        audio_opts = [[] for _ in f0_up_keys]
+        for b in range(0, len(rows), self.segment_batch_size):
+            outs = self.infer_rows(
+                net_g, sid, rows[b : b + self.segment_batch_size], times, protect
+            )
+            for k, out in zip(owners[b : b + self.segment_batch_size], outs):
+                audio_opts[k].append(out[self.t_pad_tgt : -self.t_pad_tgt])
+        del rows, pitch_tensors
+        audio_opts = [
+            self._finalize(prepared, audio_opt, tgt_sr, resample_sr, rms_mix_rate)
+            for audio_opt in audio_opts
+        ]
+        del sid
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return audio_opts
+
+    def pipeline(
+        self,
+        model,
+        net_g,
+        sid,
+        audio,
+        input_audio_path,
+        times,
+        f0_up_key,
+        f0_method,
+        file_index,
+        # file_big_npy,
+        index_rate,
+        if_f0,
+        filter_radius,
+        tgt_sr,
+        resample_sr,
+        rms_mix_rate,
+        version,
+        protect,
+        crepe_hop_length,
+        f0_file=None,
+    ):
+        return self.pipeline_multi(
+            model,
+            net_g,
+            sid,
+            audio,
+            input_audio_path,
+            times,
+            [f0_up_key],
+            f0_method,
+            file_index,
+            index_rate,
+            if_f0,
+            filter_radius,
+            tgt_sr,
+            resample_sr,
+            rms_mix_rate,
+            version,
+            protect,
+            crepe_hop_length,
+            f0_file,
+        )[0]
+
+    def pipeline_multi(
+        self,
+        model,
+        net_g,
+        sid,
+        audio,
+        input_audio_path,
+        times,
+        f0_up_keys,
+        f0_method,
+        file_index,
+        index_rate,
+        if_f0,
+        filter_radius,
+        tgt_sr,
+        resample_sr,
+        rms_mix_rate,
+        version,
+        protect,
+        crepe_hop_length,
+        f0_file=None,
+    ):
+        """
+        같은 입력을 여러 f0_up_key로 변환합니다.
+        pitch와 무관한 단계는 한 번만 계산하고 net_g 합성만 pitch 수만큼 반복합니다.
+        f0_up_keys 순서대로 변환 결과 리스트를 반환합니다.
+        """
+        with collector.stage("vc.prepare", f0_method=f0_method):
+            prepared = self.prepare(
+                model,
+                audio,
+                input_audio_path,
+                times,
+                f0_method,
+                file_index,
+                index_rate,
+                if_f0,
+                filter_radius,
+                version,
+                protect,
+                crepe_hop_length,
+                f0_file,
+            )
+        if self.segment_batch_size:
+            audio_opts = self.synthesize_rows(
+                prepared,
+                net_g,
+                sid,
+                times,
+                f0_up_keys,
+                tgt_sr,
+                resample_sr,
+                rms_mix_rate,
+                protect,
+            )
+        elif (
+            prepared["f0"] is not None
+            and len(f0_up_keys) > 1
+            and hasattr(net_g, "infer_batch")
+        ):
+            audio_opts = self.synthesize_batch(
+                prepared,
+                net_g,
+                sid,
+                times,
+                f0_up_keys,
+                tgt_sr,
+                resample_sr,
+                rms_mix_rate,
+                protect,
+            )
+        else:
+            audio_opts = [
+                self.synthesize(
+                    prepared,
+                    net_g,
+                    sid,
+                    times,
+                    f0_up_key,
+                    tgt_sr,
+                    resample_sr,
+                    rms_mix_rate,
+                    protect,
+                )
+                for f0_up_key in f0_up_keys
+            ]
+        del prepared
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return audio_opts
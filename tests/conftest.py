@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src/ 모듈은 패키지가 아니라 모듈 이름으로 바로 import한다.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from feature_index import blend_neighbors
+
+
+def test_blend_neighbors_skips_missing_ids():
+    big_npy = np.arange(12, dtype="float32").reshape(4, 3)
+    score = np.array([[1.0, 2.0, 3.4e38], [3.4e38, 3.4e38, 3.4e38]], dtype="float32")
+    ix = np.array([[0, 3, -1], [-1, -1, -1]])
+
+    blended, found = blend_neighbors(big_npy, score, ix)
+
+    # -1은 빠지고 남은 두 이웃의 가중치(1, 1/4)만 다시 정규화된다.
+    expected = (big_npy[0] * 1.0 + big_npy[3] * 0.25) / 1.25
+    np.testing.assert_allclose(blended[0], expected, rtol=1e-6)
+    assert found.tolist() == [True, False]
+    np.testing.assert_array_equal(blended[1], np.zeros(3))
+
+
+def test_blend_neighbors_matches_plain_weighting_without_missing_ids():
+    rng = np.random.default_rng(0)
+    big_npy = rng.normal(size=(20, 5)).astype("float32")
+    score = rng.uniform(0.5, 2.0, size=(6, 4)).astype("float32")
+    ix = rng.integers(0, 20, size=(6, 4))
+
+    blended, found = blend_neighbors(big_npy, score, ix)
+
+    weight = np.square(1 / score)
+    weight /= weight.sum(axis=1, keepdims=True)
+    expected = np.sum(big_npy[ix] * np.expand_dims(weight, axis=2), axis=1)
+    np.testing.assert_allclose(blended, expected, rtol=1e-5)
+    assert found.all()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+
+from model_registry import ModelRegistry
+
+
+def test_concurrent_misses_load_once():
+    registry = ModelRegistry(budget_bytes=1 << 30)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return "model"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get(("a",), loader, nbytes=1)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["model"] * 4
+    assert len(calls) == 1
+    assert registry.load_count("a") == 1
+
+
+def test_slow_load_does_not_block_cached_lookup():
+    registry = ModelRegistry(budget_bytes=1 << 30)
+    registry.get(("cached",), lambda: "hit", nbytes=1)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    thread = threading.Thread(target=registry.get, args=(("slow",), slow_loader, 1))
+    thread.start()
+    started.wait(5)
+    try:
+        t0 = time.perf_counter()
+        assert registry.get(("cached",), lambda: "reloaded") == "hit"
+        assert time.perf_counter() - t0 < 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_failed_load_can_be_retried():
+    registry = ModelRegistry(budget_bytes=1 << 30)
+
+    def broken():
+        raise RuntimeError("corrupt checkpoint")
+
+    with pytest.raises(RuntimeError):
+        registry.get(("m",), broken, nbytes=1)
+    assert registry.get(("m",), lambda: "ok", nbytes=1) == "ok"
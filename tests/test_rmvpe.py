@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("librosa")
+
+from rmvpe import E2E, RMVPE, unet_context_frames
+
+
+@pytest.fixture
+def rmvpe(tmp_path):
+    torch.manual_seed(0)
+    model_path = tmp_path / "rmvpe.pt"
+    torch.save(E2E(4, 1, (2, 2)).state_dict(), model_path)
+    rmvpe = RMVPE(str(model_path), False, device="cpu")
+    # 긴 입력을 빠르게 돌리기 위해 receptive field가 작은 모델로 바꾼다.
+    rmvpe.model = E2E(1, 1, (2, 2), en_de_layers=2, inter_layers=1).eval()
+    return rmvpe
+
+
+def test_unet_context_frames_default_model():
+    assert unet_context_frames(E2E(4, 1, (2, 2))) == 1632
+
+
+def test_windowed_salience_matches_full(rmvpe):
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 0.1, 160 * 1500 + 77).astype("float32")
+    context = unet_context_frames(rmvpe.model)
+
+    full = rmvpe.mel2hidden(
+        rmvpe.mel_extractor(torch.from_numpy(audio).unsqueeze(0), center=True)
+    ).squeeze(0)
+    windowed = rmvpe.audio2hidden_windowed(audio, max_frames=2 * context + 64)
+
+    assert windowed.shape == full.shape
+    torch.testing.assert_close(windowed, full, atol=1e-5, rtol=1e-4)
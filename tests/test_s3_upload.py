@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+from botocore.exceptions import ClientError
+
+from s3_upload import BackgroundUploader, S3Uploader, make_s3_client
+
+BUCKET = "test-bucket"
+SAVE_DIR = "/song-requests/1/2"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = make_s3_client(region_name="us-east-1", endpoint_url=None)
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+class FlakyClient:
+    """처음 failures번은 업로드를 ClientError로 실패시키는 S3 클라이언트 래퍼."""
+
+    def __init__(self, client, failures):
+        self.client = client
+        self.failures = failures
+        self.calls = 0
+
+    def upload_file(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ClientError(
+                {"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."}},
+                "PutObject",
+            )
+        return self.client.upload_file(*args, **kwargs)
+
+
+def _write(path, data=b"data"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _keys(client):
+    response = client.list_objects_v2(Bucket=BUCKET)
+    return sorted(item["Key"] for item in response.get("Contents", []))
+
+
+def test_upload_folder_key_layout_and_filter(s3, tmp_path):
+    _write(str(tmp_path / "song_0_mr.mp3"))
+    _write(str(tmp_path / "song_0_reverb.mp3"))
+    _write(str(tmp_path / "sub" / "song_2_mr.mp3"))
+    _write(str(tmp_path / "song_0_vocals.wav"))
+    _write(str(tmp_path / "timing_report.json"))
+
+    keys = S3Uploader(s3, BUCKET, max_workers=2).upload_folder(str(tmp_path), SAVE_DIR)
+
+    expected = [
+        "/song-requests/1/2/song_0_mr.mp3",
+        "/song-requests/1/2/song_0_reverb.mp3",
+        "/song-requests/1/2/sub/song_2_mr.mp3",
+    ]
+    assert sorted(keys) == expected
+    assert _keys(s3) == expected
+    body = s3.get_object(Bucket=BUCKET, Key=expected[0])["Body"].read()
+    assert body == b"data"
+
+
+def test_upload_folder_without_filter(s3, tmp_path):
+    _write(str(tmp_path / "song_0_vocals.wav"))
+    keys = S3Uploader(s3, BUCKET).upload_folder(
+        str(tmp_path), SAVE_DIR, include_suffixes=None
+    )
+    assert keys == ["/song-requests/1/2/song_0_vocals.wav"]
+
+
+def test_upload_file_retries_transient_client_error(s3, tmp_path):
+    path = _write(str(tmp_path / "song_0_mr.mp3"))
+    client = FlakyClient(s3, failures=2)
+    uploader = S3Uploader(client, BUCKET, max_attempts=3, backoff_base=0)
+
+    assert uploader.upload_file(path, "a/song_0_mr.mp3") == "a/song_0_mr.mp3"
+    assert client.calls == 3
+    assert _keys(s3) == ["a/song_0_mr.mp3"]
+
+
+def test_upload_file_gives_up_after_max_attempts(s3, tmp_path):
+    path = _write(str(tmp_path / "song_0_mr.mp3"))
+    client = FlakyClient(s3, failures=5)
+    uploader = S3Uploader(client, BUCKET, max_attempts=2, backoff_base=0)
+
+    with pytest.raises(ClientError):
+        uploader.upload_file(path, "a/song_0_mr.mp3")
+    assert client.calls == 2
+    assert _keys(s3) == []
+
+
+def test_upload_file_does_not_retry_missing_file(s3, tmp_path):
+    client = FlakyClient(s3, failures=0)
+    uploader = S3Uploader(client, BUCKET, max_attempts=3, backoff_base=0)
+
+    with pytest.raises(FileNotFoundError):
+        uploader.upload_file(str(tmp_path / "missing.mp3"), "a/missing.mp3")
+    assert client.calls == 1
+
+
+def test_background_uploader(s3, tmp_path):
+    first = _write(str(tmp_path / "song_0_mr.mp3"))
+    second = _write(str(tmp_path / "sub" / "song_0_reverb.mp3"))
+    uploader = S3Uploader(FlakyClient(s3, failures=1), BUCKET, backoff_base=0)
+    background = BackgroundUploader(uploader, str(tmp_path), SAVE_DIR)
+
+    background.submit(first)
+    background.submit(first, second)  # 이미 넘긴 파일은 다시 올리지 않는다
+
+    expected = [
+        "/song-requests/1/2/song_0_mr.mp3",
+        "/song-requests/1/2/sub/song_0_reverb.mp3",
+    ]
+    assert sorted(background.wait()) == expected
+    assert _keys(s3) == expected
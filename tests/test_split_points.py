@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from split_points import _find_split_points_legacy, find_split_points
+
+SR = 16000
+# rvc.Config.device_config 기본값 (x_query=10, x_center=60, x_max=65)
+ARGS = (160, SR * 60, SR * 10, SR * 65)
+
+
+def _noise_with_silence(seed=0):
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 0.3, SR * 200)
+    audio[SR * 50 : SR * 80] = 0
+    audio[SR * 110 : SR * 140] = 0
+    return audio
+
+
+def test_digital_silence_matches_legacy():
+    audio = _noise_with_silence()
+    assert find_split_points(audio, *ARGS) == _find_split_points_legacy(audio, *ARGS)
+
+
+def test_first_silent_position_wins_ties():
+    audio = _noise_with_silence()
+    # 각 기준점의 탐색 구간이 무음 안에서 시작하면 구간의 첫 위치를 고른다
+    audio[SR * 40 : SR * 80] = 0
+    points = find_split_points(audio, *ARGS)
+    assert points[0] == SR * 50
+    assert points == _find_split_points_legacy(audio, *ARGS)
+
+
+def test_sub_resolution_tail_is_still_silent():
+    signal = pytest.importorskip("scipy.signal")
+    audio = _noise_with_silence(seed=1)
+    bh, ah = signal.butter(N=5, Wn=48, btype="high", fs=SR)
+    audio = signal.filtfilt(bh, ah, audio)
+    audio[SR * 52 : SR * 78] = 0
+    audio[SR * 112 : SR * 138] = 0
+    window = ARGS[0]
+    audio_pad = np.pad(audio, (window // 2, window // 2), mode="reflect")
+    # 60초, 120초 기준점은 무음 구간을 탐색한다 (180초는 노이즈뿐)
+    for t in find_split_points(audio, *ARGS)[:2]:
+        assert abs(audio_pad[t : t + window].sum()) < 1e-9
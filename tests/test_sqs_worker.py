@@ -0,0 +1,140 @@
+import json
+import time
+
+import pytest
+
+moto = pytest.importorskip("moto")
+execute = pytest.importorskip("execute")
+
+from s3_upload import make_s3_client
+
+BODY = {
+    "requestId": "req-1",
+    "requestUserId": "user-1",
+    "modelName": "이재빈",
+    "isMaleSinger": "true",
+    "model": "ljb",
+    "guideName": "guide",
+    "guideId": "guide-1",
+    "requestAt": "2024-01-01T00:00:00Z",
+}
+
+
+class FakeResponse:
+    def json(self):
+        return {"ok": True}
+
+
+@pytest.fixture
+def aws(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    # 결과/보고서 폴더(./temp)는 tmp_path 아래에 만든다.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(execute, "SQS_WAIT_TIME_SECONDS", 0)
+    monkeypatch.setattr(execute, "SQS_VISIBILITY_TIMEOUT", 1)
+    # 공용 폴더(/app/guides 등)를 지우는 정리 단계는 테스트에서 돌리지 않는다.
+    monkeypatch.setattr(execute.SQSProcessor, "cleanup", lambda self: True)
+    with moto.mock_aws():
+        s3 = make_s3_client(region_name="us-east-1", endpoint_url=None)
+        s3.create_bucket(Bucket="song-request-bucket-1")
+        sqs = execute.boto3.client("sqs", region_name="us-east-1")
+        queue_url = sqs.create_queue(QueueName="song-requests")["QueueUrl"]
+        sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps(BODY))
+        yield s3, sqs, queue_url
+
+
+def _queue_counts(sqs, queue_url):
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=[
+            "ApproximateNumberOfMessages",
+            "ApproximateNumberOfMessagesNotVisible",
+        ],
+    )["Attributes"]
+    return (
+        int(attributes["ApproximateNumberOfMessages"]),
+        int(attributes["ApproximateNumberOfMessagesNotVisible"]),
+    )
+
+
+def test_receive_process_delete(aws, monkeypatch):
+    s3, sqs, queue_url = aws
+    calls = []
+
+    def fake_infer_ai_cover(request_id, *args, on_pair_ready=None):
+        calls.append(request_id)
+        return f"./temp/{request_id}", [{"mrUrl": "m", "vocalUrl": "v"}]
+
+    posted = []
+    monkeypatch.setattr(execute, "infer_ai_cover", fake_infer_ai_cover)
+    monkeypatch.setattr(
+        execute.requests, "post", lambda url, json: posted.append(json) or FakeResponse()
+    )
+
+    worker = execute.SQSWorker(queue_url, s3=s3, sqs=sqs)
+    worker.run(max_messages=1)
+
+    assert (worker.processed, worker.failed) == (1, 0)
+    assert calls == ["req-1"]
+    assert posted[0]["songRequestId"] == "req-1"
+    assert _queue_counts(sqs, queue_url) == (0, 0)
+    time.sleep(1.1)
+    assert worker.receive() == []
+
+
+def test_failed_message_is_left_for_redelivery(aws, monkeypatch):
+    s3, sqs, queue_url = aws
+
+    def failing_infer_ai_cover(*args, **kwargs):
+        raise RuntimeError("inference failed")
+
+    monkeypatch.setattr(execute, "infer_ai_cover", failing_infer_ai_cover)
+
+    worker = execute.SQSWorker(queue_url, s3=s3, sqs=sqs)
+    worker.run(max_messages=1)
+
+    assert (worker.processed, worker.failed) == (0, 1)
+    # 지우지 않았으므로 visibility timeout이 지나면 다시 받을 수 있다.
+    time.sleep(1.1)
+    messages = worker.receive()
+    assert len(messages) == 1
+    assert json.loads(messages[0]["Body"])["requestId"] == "req-1"
+
+
+def test_heartbeat_extends_visibility(aws):
+    _, sqs, queue_url = aws
+    worker = execute.SQSWorker(queue_url, s3=object(), sqs=sqs)
+    (message,) = worker.receive()
+
+    with execute.VisibilityHeartbeat(
+        sqs, queue_url, message["ReceiptHandle"], interval=0.2, visibility_timeout=30
+    ):
+        # 받을 때의 visibility timeout(1초)보다 오래 처리한다.
+        time.sleep(1.5)
+        assert worker.receive() == []
+    assert _queue_counts(sqs, queue_url) == (0, 1)
+
+
+def test_heartbeat_calls_change_message_visibility(aws):
+    _, sqs, queue_url = aws
+    calls = []
+
+    class RecordingSQS:
+        def change_message_visibility(self, **kwargs):
+            calls.append(kwargs)
+            return sqs.change_message_visibility(**kwargs)
+
+    worker = execute.SQSWorker(queue_url, s3=object(), sqs=sqs)
+    (message,) = worker.receive()
+    with execute.VisibilityHeartbeat(
+        RecordingSQS(), queue_url, message["ReceiptHandle"], interval=0.05, visibility_timeout=30
+    ):
+        time.sleep(0.3)
+
+    assert calls
+    assert calls[0] == {
+        "QueueUrl": queue_url,
+        "ReceiptHandle": message["ReceiptHandle"],
+        "VisibilityTimeout": 30,
+    }
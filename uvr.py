@@ -3,8 +3,9 @@ import shutil
 import random
 import string
 import subprocess
-import time
-import requests
+import asyncio
+import threading
+import httpx
 from urllib.parse import urlparse
 
 def generate_random_identifier(length=8):
@@ -12,8 +13,61 @@ def generate_random_identifier(length=8):
     characters = string.ascii_letters + string.digits
     return ''.join(random.choice(characters) for _ in range(length))
 
-async def download_mp3(url):
-    """URL에서 MP3 파일을 다운로드하여 로컬에 저장"""
+# 다운로드 제한/재시도 설정
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_MB", "200")) * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_TIMEOUT = httpx.Timeout(
+    float(os.getenv("DOWNLOAD_TIMEOUT", "60")),
+    connect=float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10")),
+)
+
+_http_client = None
+
+
+def get_http_client():
+    """요청 사이에 커넥션을 재사용하는 프로세스 공용 AsyncClient"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=DOWNLOAD_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _stream_to_file(client, url, save_path, max_bytes):
+    part_path = f"{save_path}.part"
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file: {response.status_code}")
+            length = response.headers.get("content-length")
+            if length is not None and int(length) > max_bytes:
+                raise Exception(f"File too large: {length} bytes")
+            size = 0
+            with open(part_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise Exception(f"File too large: over {max_bytes} bytes")
+                    f.write(chunk)
+        os.replace(part_path, save_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+async def download_mp3(url, max_bytes=DOWNLOAD_MAX_BYTES, retries=DOWNLOAD_RETRIES):
+    """URL에서 MP3 파일을 이벤트 루프를 막지 않고 chunk 단위로 받아 로컬에 저장"""
     # 랜덤 식별자로 임시 작업 폴더 생성
     identifier = generate_random_identifier(8)
     temp_dir = os.path.join(os.getcwd(), "temp", identifier)
@@ -23,13 +77,121 @@ async def download_mp3(url):
     filename = os.path.basename(urlparse(url).path)
     save_path = os.path.join(temp_dir, filename)
     
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-        return save_path, identifier  # identifier도 함께 반환
-    else:
-        raise Exception(f"Failed to download file: {response.status_code}")
+    client = get_http_client()
+    for attempt in range(1, retries + 1):
+        try:
+            await _stream_to_file(client, url, save_path, max_bytes)
+            return save_path, identifier  # identifier도 함께 반환
+        except httpx.TransportError as e:
+            # 연결/타임아웃 오류만 재시도 (상태 코드/크기 오류는 바로 실패)
+            if attempt == retries:
+                raise Exception(f"Failed to download file: {e}")
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+# 분리 모델 설정. 모델은 워커 프로세스당 한 번만 로드해서 재사용한다.
+SEPARATOR_MODEL_DIR = os.getenv("SEPARATOR_MODEL_DIR", "/tmp/audio-separator-models/")
+# 모델별 Separator가 결과를 쓰는 작업 폴더 (요청 폴더와 같은 파일시스템에 두어 이동을 rename으로)
+SEPARATOR_WORK_DIR = os.getenv(
+    "SEPARATOR_WORK_DIR", os.path.join(os.getcwd(), "temp", ".separator")
+)
+MDX_PARAMS = {
+    "hop_length": 1024,
+    "segment_size": 256,
+    "overlap": 0.25,
+    "batch_size": 1,
+    "enable_denoise": False,
+}
+VR_PARAMS = {
+    "batch_size": 1,
+    "window_size": 320,
+    "aggression": 10,
+    "enable_tta": False,
+    "enable_post_process": False,
+    "post_process_threshold": 0.2,
+    "high_end_process": False,
+}
+
+_separators = {}  # model_filename -> (Separator, Lock)
+_separators_lock = threading.Lock()
+
+
+def get_separator(model_filename):
+    """
+    모델별 Separator를 한 번만 만들고 load_model까지 해서 캐시합니다.
+    출력 폴더는 생성자 인자로만 정할 수 있으므로 모델마다 고정된 작업 폴더를 쓴다.
+    """
+    with _separators_lock:
+        entry = _separators.get(model_filename)
+        if entry is None:
+            from audio_separator.separator import Separator
+
+            separator = Separator(
+                model_file_dir=SEPARATOR_MODEL_DIR,
+                output_dir=os.path.join(SEPARATOR_WORK_DIR, model_filename),
+                output_format="WAV",  # 중간 결과는 무손실로 두고 최종 stem만 mp3로 인코딩
+                normalization_threshold=0.9,
+                mdx_params=MDX_PARAMS,
+                vr_params=VR_PARAMS,
+            )
+            separator.load_model(model_filename=model_filename)
+            entry = (separator, threading.Lock())
+            _separators[model_filename] = entry
+        return entry
+
+
+def run_separator(model_filename, input_path, output_dir):
+    """
+    캐시된 모델로 input_path를 분리하고 WAV stem을 output_dir로 옮깁니다.
+    한 Separator는 요청별 상태를 들고 있으므로 같은 모델은 한 번에 하나씩만 돌린다.
+    """
+    separator, lock = get_separator(model_filename)
+    with lock:
+        output_files = separator.separate(input_path)
+        for file_name in output_files:
+            shutil.move(
+                os.path.join(separator.output_dir, file_name),
+                os.path.join(output_dir, os.path.basename(file_name)),
+            )
+
+
+def encode_mp3(wav_path, mp3_path):
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", wav_path, "-b:a", "320k", mp3_path],
+        check=True,
+    )
+
+
+def _separate_chain(temp_file_path, temp_dir, identifier):
+    # 1단계: Kim Vocal 1 분리
+    print("Separating with Kim Vocal 1...")
+    run_separator("Kim_Vocal_1.onnx", temp_file_path, temp_dir)
+
+    # 2단계: 6HP-Karaoke 분리
+    vocals_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1.wav"
+    print("Applying 6HP-Karaoke separation...")
+    run_separator("6_HP-Karaoke-UVR.pth", vocals_path, temp_dir)
+
+    # 3단계: Reverb 적용
+    karaoke_vocals_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR.wav"
+    print("Applying Reverb...")
+    run_separator("Reverb_HQ_By_FoxJoy.onnx", karaoke_vocals_path, temp_dir)
+
+    # 4단계: Denoising 적용
+    reverb_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR_(No Reverb)_Reverb_HQ_By_FoxJoy.wav"
+    print("Applying Denoising...")
+    run_separator("UVR-DeNoise.pth", reverb_path, temp_dir)
+
+    # 최종 stem 세 개만 mp3로 인코딩
+    result_paths = {
+        'mr': f"{temp_dir}/{identifier}_(Instrumental)_Kim_Vocal_1",
+        'chorus': f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Instrumental)_6_HP-Karaoke-UVR",
+        'vocal': f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR_(No Reverb)_Reverb_HQ_By_FoxJoy_(Instrumental)_UVR-DeNoise"
+    }
+    for key, base in result_paths.items():
+        encode_mp3(f"{base}.wav", f"{base}.mp3")
+        result_paths[key] = f"{base}.mp3"
+    return result_paths
+
 
 async def separate_audio_tracks(input_file_path, identifier):
     """
@@ -44,68 +206,11 @@ async def separate_audio_tracks(input_file_path, identifier):
     temp_file_path = os.path.join(temp_dir, f"{identifier}.mp3")
     
     # 입력 파일을 임시 디렉토리로 복사
-    shutil.copy2(input_file_path, temp_file_path)
-    
-    # 1단계: Kim Vocal 1 분리
-    print("Separating with Kim Vocal 1...")
-    subprocess.run([
-        "audio-separator", temp_file_path, 
-        "-m", "Kim_Vocal_1.onnx",
-        "--output_dir", temp_dir,
-        "--output_format", "mp3",
-        "--normalization", "0.9",
-        "--mdx_segment_size", "256",
-        "--mdx_overlap", "0.25"
-    ], check=True)
-    time.sleep(2)
-    
-    # 2단계: 6HP-Karaoke 분리
-    vocals_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1.mp3"
-    print("Applying 6HP-Karaoke separation...")
-    subprocess.run([
-        "audio-separator", vocals_path,
-        "-m", "6_HP-Karaoke-UVR.pth",
-        "--output_dir", temp_dir,
-        "--output_format", "mp3",
-        "--normalization", "0.9",
-        "--vr_window_size", "320",
-        "--vr_aggression", "10"
-    ], check=True)
-    time.sleep(2)
-    
-    # 3단계: Reverb 적용
-    karaoke_vocals_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR.mp3"
-    print("Applying Reverb...")
-    subprocess.run([
-        "audio-separator", karaoke_vocals_path,
-        "-m", "Reverb_HQ_By_FoxJoy.onnx",
-        "--output_dir", temp_dir,
-        "--output_format", "mp3",
-        "--normalization", "0.9",
-        "--mdx_segment_size", "256",
-        "--mdx_overlap", "0.25"
-    ], check=True)
-    time.sleep(2)
-    
-    # 4단계: Denoising 적용
-    reverb_path = f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR_(No Reverb)_Reverb_HQ_By_FoxJoy.mp3"
-    print("Applying Denoising...")
-    subprocess.run([
-        "audio-separator", reverb_path,
-        "-m", "UVR-DeNoise.pth",
-        "--output_dir", temp_dir,
-        "--output_format", "mp3",
-        "--normalization", "0.9",
-        "--vr_window_size", "320",
-        "--vr_aggression", "10"
-    ], check=True)
-    time.sleep(2)
-    
-    # 결과 파일 경로 반환
-    result_paths = {
-        'mr': f"{temp_dir}/{identifier}_(Instrumental)_Kim_Vocal_1.mp3",
-        'chorus': f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Instrumental)_6_HP-Karaoke-UVR.mp3",
-        'vocal': f"{temp_dir}/{identifier}_(Vocals)_Kim_Vocal_1_(Vocals)_6_HP-Karaoke-UVR_(No Reverb)_Reverb_HQ_By_FoxJoy_(Instrumental)_UVR-DeNoise.mp3"
-    }
+    if os.path.abspath(input_file_path) != os.path.abspath(temp_file_path):
+        shutil.copy2(input_file_path, temp_file_path)
     
-    return result_paths
\ No newline at end of file
+    # 분리는 블로킹 작업이므로 이벤트 루프 밖에서 실행
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, _separate_chain, temp_file_path, temp_dir, identifier
+    )